@@ -0,0 +1,67 @@
+"""
+Shared bootstrapping for the benchmark scripts: Django set up against a
+throwaway SQLite database, migrated and filled with a synthetic catalog.
+"""
+import os
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'locallibrary.settings')
+
+
+def setup_django(database_path=None):
+    """
+    Configures Django to use database_path (a new temporary file by default,
+    or the empty database of DATABASE_URL when that is set) before any
+    connection is opened, and migrates it.
+    """
+    import django
+    from django.conf import settings
+
+    if os.environ.get('DATABASE_URL') and database_path is None:
+        database_path = settings.DATABASES['default']['NAME']
+    else:
+        if database_path is None:
+            database_path = Path(tempfile.mkdtemp(prefix='locallibrary-bench-')) / 'bench.sqlite3'
+        settings.DATABASES['default']['NAME'] = database_path
+    django.setup()
+
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+    return database_path
+
+
+def seed_catalog(books=1000, copies_per_book=3, authors=100, genres=20, seed=0):
+    """
+    Bulk-creates a synthetic catalog and returns (book ids, copy ids).
+    """
+    from django.db import transaction
+    from catalog.models import Author, Book, BookInstance, Genre
+    from catalog.search import rebuild_index
+
+    rng = random.Random(seed)
+    with transaction.atomic():
+        author_objs = Author.objects.bulk_create(
+            Author(first_name=f'First{i}', last_name=f'Last{i}') for i in range(authors)
+        )
+        genre_objs = Genre.objects.bulk_create(Genre(name=f'Genre {i}') for i in range(genres))
+        book_objs = Book.objects.bulk_create(
+            (Book(title=f'Title {i}', summary='Summary ' * 20, isbn=f'{i:013d}',
+                  author=rng.choice(author_objs), copies_total=copies_per_book, copies_on_loan=copies_per_book)
+             for i in range(books)),
+            batch_size=1000,
+        )
+        Book.genre.through.objects.bulk_create(
+            (Book.genre.through(book_id=book.pk, genre_id=rng.choice(genre_objs).pk) for book in book_objs),
+            batch_size=1000,
+        )
+        copy_objs = BookInstance.objects.bulk_create(
+            (BookInstance(book=book, imprint='Imprint', status='o', borrower=None) for book in book_objs
+             for _ in range(copies_per_book)),
+            batch_size=1000,
+        )
+        rebuild_index()
+    return [book.pk for book in book_objs], [copy.pk for copy in copy_objs]
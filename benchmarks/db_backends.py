@@ -0,0 +1,136 @@
+"""
+Throughput of the hot catalog views (home page, book list, book detail and
+author list) on SQLite and on PostgreSQL, served by N threads of one
+process the way a gunicorn --threads worker serves them, with the page
+cache off so every request reaches the database.
+
+PostgreSQL runs on a throwaway server (catalog.testing.temporary_postgres,
+needs initdb and pg_ctl, psycopg2 and dj-database-url) three ways: a new
+connection per request (CONN_MAX_AGE=0), one kept by every thread
+(CONN_MAX_AGE=600) and the shared pool (DJANGO_DB_POOL_SIZE). Every setup
+runs in a process of its own, since the settings read the environment on
+startup.
+
+    python -m benchmarks.db_backends --threads 8 --seconds 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# name: environment of the run; DATABASE_URL is added for PostgreSQL
+SETUPS = {
+    'sqlite': {},
+    'postgres': {'DJANGO_CONN_MAX_AGE': '0'},
+    'postgres kept': {'DJANGO_CONN_MAX_AGE': '600'},
+    'postgres pool': {'DJANGO_DB_POOL_SIZE': 'threads'},
+}
+
+
+def serve(urls, seconds, latencies):
+    from django.db import close_old_connections, connection
+    from django.test import Client
+
+    client = Client()
+    deadline = time.monotonic() + seconds
+    index = 0
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        response = client.get(urls[index % len(urls)])
+        # Where the request handler would release the connection; the test client doesn't
+        close_old_connections()
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.status_code
+        index += 1
+    connection.close()
+
+
+def run(args):
+    """
+    One setup, in this process: seeds the catalog, warms up, then serves the
+    views from args.threads threads and prints the latencies as JSON.
+    """
+    from benchmarks._setup import seed_catalog, setup_django
+
+    setup_django()
+    book_ids, _ = seed_catalog(books=args.books)
+
+    from django.test.utils import setup_test_environment
+    from django.urls import reverse
+    from catalog.models import Author, Book
+
+    setup_test_environment()
+    urls = [
+        reverse('index'),
+        reverse('books'),
+        Book.objects.get(pk=book_ids[len(book_ids) // 2]).get_absolute_url(),
+        reverse('authors'),
+        Author.objects.order_by('pk').first().get_absolute_url(),
+    ]
+    serve(urls, 0.5, [])
+
+    latencies = [[] for _ in range(args.threads)]
+    threads = [threading.Thread(target=serve, args=(urls, args.seconds, thread_latencies))
+               for thread_latencies in latencies]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(json.dumps([latency for thread_latencies in latencies for latency in thread_latencies]))
+
+
+def measure(name, env, args):
+    env = {key: str(args.threads) if value == 'threads' else value for key, value in env.items()}
+    process_env = dict(os.environ, CATALOG_PAGE_CACHE_TIMEOUT='0', **env)
+    if 'DATABASE_URL' not in env:
+        process_env.pop('DATABASE_URL', None)
+    result = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.db_backends', '--run', f'--threads={args.threads}',
+         f'--seconds={args.seconds}', f'--books={args.books}'],
+        env=process_env, cwd=ROOT, capture_output=True, text=True,
+    )
+    if result.returncode:
+        raise RuntimeError(f'{name} failed:\n{result.stderr}')
+    latencies = json.loads(result.stdout.splitlines()[-1])
+    percentiles = statistics.quantiles(latencies, n=100)
+    print(f'{name:<16}{len(latencies) / args.seconds:>12.0f}'
+          f'{percentiles[49] * 1e3:>8.1f}ms{percentiles[98] * 1e3:>8.1f}ms', flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--books', type=int, default=1000)
+    parser.add_argument('--run', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run:
+        run(args)
+        return
+
+    sys.path.insert(0, str(ROOT))
+    from catalog.testing import temporary_postgres
+
+    print(f'{args.threads} threads, {args.seconds:g}s each, {args.books} books')
+    print(f'{"database":<16}{"requests/s":>12}{"p50":>10}{"p99":>10}')
+    measure('sqlite', SETUPS['sqlite'], args)
+
+    postgres_setups = [name for name in SETUPS if name != 'sqlite']
+    databases = {name: f'bench_{index}' for index, name in enumerate(postgres_setups)}
+    try:
+        with temporary_postgres(databases.values()) as server:
+            for name in postgres_setups:
+                measure(name, dict(SETUPS[name], DATABASE_URL=f'{server}/{databases[name]}'), args)
+    except FileNotFoundError as e:
+        print(f'PostgreSQL skipped: {e}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Latency of /catalog/mybooks/ for N concurrent signed-in users (one process
+each) under every session engine of settings.SESSION_ENGINES.
+
+Every user signs in once, then requests the page in a loop through the full
+middleware stack (the test client, no network). With the default locmem
+cache each process has its own cache, which is enough here since a user
+never leaves its process; DJANGO_CACHE_BACKEND=file shares one.
+
+    python -m benchmarks.session_engines --users 50 --seconds 5
+"""
+import argparse
+import multiprocessing
+import statistics
+import time
+
+from benchmarks._setup import seed_catalog, setup_django
+
+PASSWORD = 'bench-password'
+
+
+def user(engine, username, seconds, results):
+    from django.conf import settings
+    from django.db import connection
+    from django.test import Client
+
+    # Read by SessionMiddleware when the client builds its handler
+    settings.SESSION_ENGINE = settings.SESSION_ENGINES[engine]
+    client = Client()
+    assert client.login(username=username, password=PASSWORD)
+    # Untimed: the first request imports, loads templates and connects
+    client.get('/catalog/mybooks/')
+
+    latencies = []
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        response = client.get('/catalog/mybooks/')
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.status_code
+    connection.close()
+    results.put(latencies)
+
+
+def run(engine, usernames, seconds):
+    from django.db import connections
+
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    processes = [context.Process(target=user, args=(engine, username, seconds, results)) for username in usernames]
+    for process in processes:
+        process.start()
+    latencies = [latency for _ in processes for latency in results.get()]
+    for process in processes:
+        process.join()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--loans', type=int, default=5, help='Copies on loan to each user.')
+    args = parser.parse_args()
+
+    setup_django()
+    _, copy_ids = seed_catalog(books=args.users * args.loans, copies_per_book=1)
+
+    from django.conf import settings
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from django.test.utils import setup_test_environment
+    from catalog.models import BookInstance
+
+    setup_test_environment()
+    # One hash for everybody: hashing 50 passwords would dominate the setup
+    password = make_password(PASSWORD)
+    users = User.objects.bulk_create(User(username=f'user{i}', password=password) for i in range(args.users))
+    for index, borrower in enumerate(users):
+        BookInstance.objects.filter(pk__in=copy_ids[index * args.loans:(index + 1) * args.loans]).update(
+            borrower=borrower)
+
+    print(f'{args.users} users, {args.seconds:g}s each, {args.loans} loans per user')
+    print(f'{"engine":<16}{"requests/s":>12}{"p50":>10}{"p99":>10}')
+    for engine in settings.SESSION_ENGINES:
+        latencies = run(engine, [borrower.username for borrower in users], args.seconds)
+        percentiles = statistics.quantiles(latencies, n=100)
+        print(f'{engine:<16}{len(latencies) / args.seconds:>12.0f}'
+              f'{percentiles[49] * 1e3:>8.1f}ms{percentiles[98] * 1e3:>8.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
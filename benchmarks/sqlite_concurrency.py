@@ -0,0 +1,97 @@
+"""
+Read/write throughput of N concurrent worker processes against one SQLite
+file, with the default connection setup ("before") and with
+settings.SQLITE_PRAGMAS and persistent connections ("after").
+
+Each worker loops over simulated requests: mostly book detail reads, and a
+share of renewals (a one-row UPDATE in a transaction). After every request
+the connection is released the way Django does at request end, which
+reconnects when CONN_MAX_AGE is 0.
+
+    python -m benchmarks.sqlite_concurrency --workers 8 --seconds 5
+"""
+import argparse
+import datetime
+import multiprocessing
+import random
+import time
+
+from benchmarks._setup import seed_catalog, setup_django
+
+
+def worker(mode, book_ids, copy_ids, write_ratio, seconds, results, seed):
+    from django.conf import settings
+    from django.db import OperationalError, close_old_connections, connection, transaction
+    from catalog.models import Book, BookInstance
+
+    if mode == 'before':
+        settings.SQLITE_PRAGMAS = {}
+        connection.settings_dict['CONN_MAX_AGE'] = 0
+        connection.settings_dict['OPTIONS'] = {}
+
+    rng = random.Random(seed)
+    reads = writes = locked = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            if rng.random() < write_ratio:
+                with transaction.atomic():
+                    BookInstance.objects.filter(pk=rng.choice(copy_ids)).update(
+                        due_back=datetime.date.today() + datetime.timedelta(days=rng.randint(1, 28))
+                    )
+                writes += 1
+            else:
+                book = (Book.objects.select_related('author').prefetch_related('genre', 'bookinstance_set')
+                        .get(pk=rng.choice(book_ids)))
+                list(book.bookinstance_set.all())
+                reads += 1
+        except OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            locked += 1
+        close_old_connections()
+    connection.close()
+    results.put((reads, writes, locked))
+
+
+def run(mode, workers, book_ids, copy_ids, write_ratio, seconds):
+    from django.db import connection, connections
+
+    # WAL is a property of the database file, so "before" has to switch it back
+    with connection.cursor() as cursor:
+        cursor.execute(f"PRAGMA journal_mode = {'DELETE' if mode == 'before' else 'WAL'}")
+    connections.close_all()
+
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(mode, book_ids, copy_ids, write_ratio, seconds, results, seed))
+        for seed in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    totals = [sum(column) for column in zip(*(results.get() for _ in processes))]
+    for process in processes:
+        process.join()
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--books', type=int, default=2000)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    args = parser.parse_args()
+
+    path = setup_django()
+    book_ids, copy_ids = seed_catalog(books=args.books)
+    print(f'{args.workers} workers, {args.seconds:g}s each, {args.write_ratio:.0%} writes, database {path}')
+    print(f'{"mode":<8}{"reads/s":>12}{"writes/s":>12}{"locked":>10}')
+    for mode in ('before', 'after'):
+        reads, writes, locked = run(mode, args.workers, book_ids, copy_ids, args.write_ratio, args.seconds)
+        print(f'{mode:<8}{reads / args.seconds:>12.0f}{writes / args.seconds:>12.0f}{locked:>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Template render time per request of the index, book list and book detail
+pages, for an anonymous visitor and a librarian, with the plain template
+loaders and no sidebar fragment cache ("before") and with the cached loader
+and the sidebar fragment cache ("after").
+
+The context of every page is captured once from a real request; only the
+rendering is timed, so database time is left out.
+
+    python -m benchmarks.template_render --renders 500
+"""
+import argparse
+import copy
+import time
+
+from benchmarks._setup import seed_catalog, setup_django
+
+PLAIN_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+def capture(client, url):
+    """
+    Requests url and returns the top-level template name and its context.
+    """
+    from django.test.signals import template_rendered
+
+    rendered = []
+
+    def store(sender, template, context, **kwargs):
+        if not rendered:
+            rendered.append((template.name, context.flatten()))
+
+    template_rendered.connect(store)
+    try:
+        response = client.get(url)
+    finally:
+        template_rendered.disconnect(store)
+    assert response.status_code == 200, (url, response.status_code)
+    return rendered[0][0], rendered[0][1], response.wsgi_request
+
+
+def mode_settings(mode):
+    from django.conf import settings
+
+    templates = copy.deepcopy(settings.TEMPLATES)
+    caches = copy.deepcopy(settings.CACHES)
+    if mode == 'before':
+        templates[0]['OPTIONS']['loaders'] = PLAIN_LOADERS
+        caches['template_fragments'] = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+    return {'TEMPLATES': templates, 'CACHES': caches}
+
+
+def time_render(template_name, context, request, renders):
+    from django.template.loader import get_template
+
+    get_template(template_name).render(context, request)
+    start = time.perf_counter()
+    for _ in range(renders):
+        get_template(template_name).render(context, request)
+    return (time.perf_counter() - start) / renders
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--renders', type=int, default=500)
+    parser.add_argument('--books', type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+    book_ids, _ = seed_catalog(books=args.books)
+
+    from django.contrib.auth.models import Permission, User
+    from django.test import Client, override_settings
+    from django.test.utils import setup_test_environment
+    from django.urls import reverse
+    from catalog.models import Book
+
+    setup_test_environment()
+    librarian = User.objects.create_user(username='librarian', password='librarian')
+    librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+    anonymous, signed_in = Client(), Client()
+    signed_in.force_login(librarian)
+
+    pages = [
+        ('index', reverse('index')),
+        ('book list', reverse('books')),
+        ('book detail', Book.objects.get(pk=book_ids[0]).get_absolute_url()),
+    ]
+    with override_settings(CATALOG_PAGE_CACHE_TIMEOUT=0):
+        captured = [
+            (f'{name} ({viewer})', *capture(client, url))
+            for name, url in pages for viewer, client in (('anonymous', anonymous), ('librarian', signed_in))
+        ]
+
+    print(f'Mean render time per request over {args.renders} renders')
+    print(f'{"page":<28}{"before":>12}{"after":>12}')
+    timings = {}
+    for mode in ('before', 'after'):
+        with override_settings(**mode_settings(mode)):
+            for name, template_name, context, request in captured:
+                timings[name, mode] = time_render(template_name, context, request, args.renders)
+    for name, *_ in captured:
+        before, after = timings[name, 'before'], timings[name, 'after']
+        print(f'{name:<28}{before * 1e6:>10.0f}us{after * 1e6:>10.0f}us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Insert and primary key lookup speed of copy ids at 1M rows: random (uuid4)
+or time-ordered (uuid7) UUIDs, stored as 32 hex digits (the old char(32)
+column) or 16 bytes (catalog.uuids.CompactUUIDField on SQLite).
+
+Every mode fills its own table shaped like catalog_bookinstance, in
+batches of one transaction each, the way a bulk acquisition would. The
+insert rate of the first and last tenth shows how it holds up as the
+primary key index grows; lookups fetch random existing ids one by one.
+
+    python -m benchmarks.uuid_keys --rows 1000000
+"""
+import argparse
+import random
+import time
+import uuid
+
+from benchmarks._setup import setup_django
+
+MODES = [
+    ('uuid4', 'text'),
+    ('uuid7', 'text'),
+    ('uuid4', 'blob'),
+    ('uuid7', 'blob'),
+]
+
+
+def make_ids(generator, storage, rows):
+    from catalog.uuids import uuid7
+
+    new_id = uuid.uuid4 if generator == 'uuid4' else uuid7
+    if storage == 'text':
+        return [new_id().hex for _ in range(rows)]
+    return [new_id().bytes for _ in range(rows)]
+
+
+def insert(cursor, table, ids, batch_size):
+    """
+    Inserts ids in batches and returns the seconds taken by every batch.
+    """
+    from django.db import transaction
+
+    timings = []
+    for start in range(0, len(ids), batch_size):
+        batch = [(pk, 'Imprint', 'a') for pk in ids[start:start + batch_size]]
+        began = time.perf_counter()
+        with transaction.atomic():
+            cursor.executemany(f'INSERT INTO {table} (id, imprint, status) VALUES (%s, %s, %s)', batch)
+        timings.append(time.perf_counter() - began)
+    return timings
+
+
+def lookup(cursor, table, ids):
+    began = time.perf_counter()
+    for pk in ids:
+        cursor.execute(f'SELECT id, imprint, status FROM {table} WHERE id = %s', [pk])
+        assert cursor.fetchone() is not None
+    return (time.perf_counter() - began) / len(ids)
+
+
+def table_size(cursor, table):
+    # The table and its primary key index, in bytes
+    cursor.execute('SELECT SUM(pgsize) FROM dbstat WHERE name IN (SELECT name FROM sqlite_schema WHERE tbl_name = %s)',
+                   [table])
+    return cursor.fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--batch-size', type=int, default=10_000)
+    parser.add_argument('--lookups', type=int, default=10_000)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.db import connection
+
+    rng = random.Random(0)
+    tenth = max(len(range(0, args.rows, args.batch_size)) // 10, 1)
+    print(f'{args.rows} rows in batches of {args.batch_size}, {args.lookups} lookups')
+    print(f'{"ids":<8}{"storage":<9}{"rows/s":>10}{"first 10%":>11}{"last 10%":>10}{"lookup":>10}{"size":>10}')
+    with connection.cursor() as cursor:
+        for generator, storage in MODES:
+            table = f'bench_{generator}_{storage}'
+            column = 'char(32)' if storage == 'text' else 'blob'
+            cursor.execute(f'CREATE TABLE {table} (id {column} NOT NULL PRIMARY KEY, '
+                           f'imprint varchar(200) NOT NULL, status varchar(1) NOT NULL)')
+            ids = make_ids(generator, storage, args.rows)
+            timings = insert(cursor, table, ids, args.batch_size)
+
+            batch_rows = args.batch_size * tenth
+            print(f'{generator:<8}{storage:<9}{args.rows / sum(timings):>10.0f}'
+                  f'{batch_rows / sum(timings[:tenth]):>11.0f}{batch_rows / sum(timings[-tenth:]):>10.0f}'
+                  f'{lookup(cursor, table, rng.sample(ids, args.lookups)) * 1e6:>8.1f}us'
+                  f'{table_size(cursor, table) / 2 ** 20:>8.1f}MB')
+            cursor.execute(f'DROP TABLE {table}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,43 +1,171 @@
-from django.contrib import admin
+import datetime
+
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.core.paginator import Paginator
+from django.db.models import Prefetch
+from django.forms.models import BaseInlineFormSet
+from django.http import HttpResponseRedirect, QueryDict
+from django.template.response import TemplateResponse
 
 # Register your models here.
 
-from .models import Author, Genre, Book, BookInstance
+from .counters import get_status_counts
+from .forms import RenewBookForm
+from .loans import renew_many, return_many
+from .models import Author, Genre, Book, BookInstance, Language, StaleVersionError
 
 # admin.site.register(Book)
 # admin.site.register(Author)
 admin.site.register(Genre)
+admin.site.register(Language)
 # admin.site.register(BookInstance)
 
 
-class BooksInline(admin.TabularInline):
-    model = Book
+class PaginatedInlineFormSet(BaseInlineFormSet):
+    """
+    Edits one page of the related rows, so the change page renders and
+    posts a bounded number of forms however many rows there are.
+    """
+    per_page = 20
+    page_number = None
+    params = None
+
+    def get_queryset(self):
+        if not hasattr(self, 'page'):
+            queryset = super().get_queryset()
+            # pk last, so no row moves between pages
+            queryset = queryset.order_by(*self.model._meta.ordering, 'pk')
+            self.page = Paginator(queryset, self.per_page).get_page(self.page_number)
+            self._queryset = self.page.object_list
+        return self._queryset
+
+    @classmethod
+    def page_parameter(cls):
+        return f'{cls.get_default_prefix()}-page'
+
+    def page_links(self):
+        """
+        (number, query string) of the pages around the current one; the
+        number is the ellipsis where pages are left out.
+        """
+        self.get_queryset()
+        links = []
+        for number in self.page.paginator.get_elided_page_range(self.page.number, on_each_side=2, on_ends=1):
+            params = self.params.copy() if self.params is not None else QueryDict(mutable=True)
+            params[self.page_parameter()] = number
+            links.append((number, params.urlencode()))
+        return links
+
+
+class PaginatedInlineMixin:
+    """
+    Shows the inline rows a page at a time (?<prefix>-page=), with at most
+    per_page new rows added on top of a page.
+    """
+    formset = PaginatedInlineFormSet
+    template = 'admin/catalog/paginated_tabular.html'
+    per_page = 20
     extra = 0
 
+    def get_max_num(self, request, obj=None, **kwargs):
+        return self.per_page * 2
+
+    def get_formset(self, request, obj=None, **kwargs):
+        # Rejects posts with more forms than a page could have rendered
+        kwargs.setdefault('absolute_max', self.per_page * 2)
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.per_page = self.per_page
+        formset.page_number = request.GET.get(formset.page_parameter())
+        formset.params = request.GET
+        return formset
+
+
+class StaleCopyMixin:
+    """
+    Shows the change form again with an error, instead of a server error,
+    when a copy it saves was written by someone else in the meantime
+    (StaleVersionError from BookInstance.save()); the whole form is rolled
+    back, nothing of it is saved.
+    """
+
+    def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
+        try:
+            return super().changeform_view(request, object_id, form_url, extra_context)
+        except StaleVersionError:
+            self.message_user(request, 'A copy was changed by someone else while you were editing it, so nothing '
+                                       'was saved. Check the current values and save again.', messages.ERROR)
+            return HttpResponseRedirect(request.get_full_path())
+
+
+class BooksInline(PaginatedInlineMixin, admin.TabularInline):
+    model = Book
+
 
 @admin.register(Author)
 class AuthorAdmin(admin.ModelAdmin):
     list_display = ('last_name', 'first_name', 'date_of_birth', 'date_of_death')
+    # "N of M selected" would need a second COUNT over the whole table
+    show_full_result_count = False
     fields = ['first_name', 'last_name', ('date_of_birth', 'date_of_death')]
 
     inlines = [BooksInline]
 
 
-class BooksInstanceInline(admin.TabularInline):
+class BooksInstanceInline(PaginatedInlineMixin, admin.TabularInline):
     model = BookInstance
-    extra = 0
+    # A text box instead of a <select> of every user in every row
+    raw_id_fields = ('borrower',)
+
+    def get_queryset(self, request):
+        # Every row is titled with its copy's __str__, which names the book
+        return super().get_queryset(request).select_related('book')
 
 
 @admin.register(Book)
-class BookAdmin(admin.ModelAdmin):
-    list_display = ('title', 'author', 'display_genre')
+class BookAdmin(StaleCopyMixin, admin.ModelAdmin):
+    list_display = ('title', 'author', 'display_genre', 'copies_available', 'copies_total')
+    # author is nullable, so the default select_related() of the changelist skips it
+    list_select_related = ('author',)
+    # "N of M selected" would need a second COUNT over the whole table
+    show_full_result_count = False
     inlines = [BooksInstanceInline]
 
+    def get_queryset(self, request):
+        # display_genre slices genre.all(), which reads the prefetched names of the whole page
+        return super().get_queryset(request).prefetch_related(Prefetch('genre', queryset=Genre.objects.only('name')))
+
+
+class LoanStatusFilter(admin.SimpleListFilter):
+    """
+    Copies by status, or on loan past their due date, each choice with its
+    number of copies from the cached counts of catalog.counters.
+    """
+    title = 'status'
+    parameter_name = 'status'
+    OVERDUE = 'overdue'
+
+    def lookups(self, request, model_admin):
+        counts = get_status_counts()
+        choices = [(status, f'{label} ({counts.get(status, 0)})') for status, label in BookInstance.LOAN_STATUS]
+        choices.append((self.OVERDUE, f'Overdue ({counts[self.OVERDUE]})'))
+        return choices
+
+    def queryset(self, request, queryset):
+        if self.value() == self.OVERDUE:
+            # The overdue_loans() predicate, on the (status, due_back) index
+            return queryset.filter(status__exact='o', due_back__lt=datetime.date.today())
+        if self.value():
+            return queryset.filter(status__exact=self.value())
+        return queryset
+
 
 @admin.register(BookInstance)
-class BookInstanceAdmin(admin.ModelAdmin):
+class BookInstanceAdmin(StaleCopyMixin, admin.ModelAdmin):
     list_display = ('book', 'id', 'status', 'due_back', 'borrower')
-    list_filter = ('status', 'due_back')
+    list_select_related = ('book', 'borrower')
+    show_full_result_count = False
+    list_filter = (LoanStatusFilter, 'due_back')
     fieldsets = (
         ('Main', {
             'fields': ('book', 'imprint', 'id')
@@ -46,9 +174,36 @@ class BookInstanceAdmin(admin.ModelAdmin):
             'fields': ('status', 'due_back', 'borrower')
         }),
     )
-
-
-
-
-
-
+    actions = ['renew_selected', 'return_selected']
+
+    @admin.action(description='Renew selected copies on loan', permissions=['change'])
+    def renew_selected(self, request, queryset):
+        """
+        Asks for one renewal date, checked once with the RenewBookForm rules,
+        and applies it to the selection in batched UPDATEs.
+        """
+        if 'apply' in request.POST:
+            form = RenewBookForm(request.POST)
+            if form.is_valid():
+                renewed = renew_many(queryset.values_list('pk', flat=True), form.cleaned_data['renewal_date'])
+                self.message_user(request, f'Renewed {renewed} copies.', messages.SUCCESS)
+                return None
+        else:
+            form = RenewBookForm(initial={'renewal_date': datetime.date.today() + datetime.timedelta(weeks=3)})
+
+        return TemplateResponse(request, 'admin/catalog/bookinstance/renew_selected.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Renew copies',
+            'opts': self.model._meta,
+            'form': form,
+            'count': queryset.count(),
+            # Passed on as posted, so the copies themselves aren't loaded
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+            'selected': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            'select_across': request.POST.get('select_across', '0'),
+        })
+
+    @admin.action(description='Mark selected copies as returned', permissions=['change'])
+    def return_selected(self, request, queryset):
+        returned = return_many(queryset.values_list('pk', flat=True))
+        self.message_user(request, f'Marked {returned} copies as returned.', messages.SUCCESS)
@@ -0,0 +1,216 @@
+import json
+from functools import wraps
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_http_methods
+
+from .models import Author, Book, BookInstance, Genre
+from .pagination import CursorPaginator, to_key_value
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# Ids per batch request, within SQLite's default limit of 999 host parameters
+MAX_BATCH_SIZE = 500
+
+
+def _values(resource, ids):
+    model, fields, _ = RESOURCES[resource]
+    return list(model.objects.filter(pk__in=ids).order_by().values(*fields))
+
+
+def _include_author(rows):
+    return 'authors', _values('authors', {row['author'] for row in rows} - {None})
+
+
+def _include_book(rows):
+    return 'books', _values('books', {row['book'] for row in rows} - {None})
+
+
+def _include_genre(rows):
+    """
+    Adds the genre ids to every book row; links and genres come from one query.
+    """
+    genres, links = {}, {}
+    through = (Book.genre.through.objects.filter(book_id__in=[row['id'] for row in rows])
+               .order_by('genre__name').values_list('book_id', 'genre_id', 'genre__name'))
+    for book_id, genre_id, name in through:
+        links.setdefault(book_id, []).append(genre_id)
+        genres[genre_id] = {'id': genre_id, 'name': name}
+    for row in rows:
+        row['genre'] = links.get(row['id'], [])
+    return 'genres', list(genres.values())
+
+
+def _include_books_of_authors(rows):
+    """
+    Adds the book ids to every author row, from one query for all the books.
+    """
+    books = list(Book.objects.filter(author_id__in=[row['id'] for row in rows])
+                 .order_by().values(*RESOURCES['books'][1]))
+    links = {}
+    for book in books:
+        links.setdefault(book['author'], []).append(book['id'])
+    for row in rows:
+        row['books'] = links.get(row['id'], [])
+    return 'books', books
+
+
+# name: (model, fields of .values(), {include: (field it needs in the rows, loader)})
+RESOURCES = {
+    'books': (Book, [
+        'id', 'title', 'summary', 'isbn', 'author', 'language', 'copies_total', 'copies_available',
+        'last_modified',
+    ], {
+        'author': ('author', _include_author),
+        'genre': ('id', _include_genre),
+    }),
+    'authors': (Author, [
+        'id', 'first_name', 'last_name', 'date_of_birth', 'date_of_death', 'last_modified',
+    ], {
+        'books': ('id', _include_books_of_authors),
+    }),
+    'genres': (Genre, ['id', 'name'], {}),
+    # No borrower: the API is as public as the catalog pages
+    'copies': (BookInstance, ['id', 'book', 'imprint', 'status', 'due_back'], {
+        'book': ('book', _include_book),
+    }),
+}
+
+
+class BadRequest(Exception):
+    pass
+
+
+def _split(value):
+    return [item for item in (value or '').split(',') if item]
+
+
+def _fields_and_includes(request, resource):
+    """
+    The fields asked for with ?fields= (all by default, the id always) plus
+    those the includes of ?include= link through.
+    """
+    _, fields, includes = resource
+    requested = _split(request.GET.get('fields')) or fields
+    unknown = set(requested) - set(fields)
+    if unknown:
+        raise BadRequest(f'Unknown fields: {", ".join(sorted(unknown))}')
+    included = _split(request.GET.get('include'))
+    unknown = set(included) - set(includes)
+    if unknown:
+        raise BadRequest(f'Unknown includes: {", ".join(sorted(unknown))}')
+    wanted = {'id', *requested, *(includes[name][0] for name in included)}
+    return [field for field in fields if field in wanted], included
+
+
+def _side_load(resource, rows, included):
+    _, _, includes = resource
+    side_loaded = {}
+    for name in included:
+        key, side_rows = includes[name][1](rows)
+        side_loaded[key] = side_rows
+    return side_loaded
+
+
+def _response(data, status=200):
+    return JsonResponse(data, status=status, encoder=DjangoJSONEncoder)
+
+
+def _api_view(view):
+    """
+    Looks up the resource named in the URL, and answers errors in JSON too.
+    """
+    @wraps(view)
+    def wrapper(request, resource, *args, **kwargs):
+        if resource not in RESOURCES:
+            return _response({'error': 'Unknown resource'}, status=404)
+        try:
+            return view(request, RESOURCES[resource], *args, **kwargs)
+        except BadRequest as e:
+            return _response({'error': str(e)}, status=400)
+    return wrapper
+
+
+@require_GET
+@_api_view
+def resource_list(request, resource):
+    """
+    One page of a resource in its natural order, with keyset ?cursor= paging.
+    """
+    model, _, _ = resource
+    fields, included = _fields_and_includes(request, resource)
+    try:
+        page_size = min(int(request.GET.get('page_size', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+    except ValueError:
+        raise BadRequest('page_size must be a number')
+    if page_size < 1:
+        raise BadRequest('page_size must be positive')
+
+    queryset = model.objects.all()
+    paginator = CursorPaginator(queryset, page_size)
+    # The cursor needs the ordering keys even where they aren't asked for
+    keys = [attname for attname, _ in paginator.keys if attname not in fields]
+    paginator.queryset = queryset.values(*fields, *keys)
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except InvalidPage as e:
+        raise BadRequest(str(e))
+
+    rows = page.object_list
+    for row in rows:
+        for key in keys:
+            del row[key]
+
+    def link(cursor):
+        if cursor is None:
+            return None
+        params = request.GET.copy()
+        params['cursor'] = cursor
+        return f'{request.path}?{params.urlencode()}'
+
+    return _response({
+        'data': rows,
+        'included': _side_load(resource, rows, included),
+        'next': link(page.next_cursor),
+        'previous': link(page.previous_cursor),
+    })
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'POST'])
+@_api_view
+def resource_batch(request, resource):
+    """
+    Many rows by id in one query: ?ids=1,2,3, or a POST of {"ids": [...]}
+    for long lists. Rows come back in the order asked for; ids not found
+    are listed under "missing".
+    """
+    model, _, _ = resource
+    fields, included = _fields_and_includes(request, resource)
+    if request.method == 'POST':
+        try:
+            ids = json.loads(request.body)['ids']
+        except (ValueError, KeyError, TypeError):
+            raise BadRequest('Expected a JSON object with an "ids" list')
+        if not isinstance(ids, list):
+            raise BadRequest('Expected a JSON object with an "ids" list')
+    else:
+        ids = _split(request.GET.get('ids'))
+    if len(ids) > MAX_BATCH_SIZE:
+        raise BadRequest(f'At most {MAX_BATCH_SIZE} ids per request')
+    try:
+        ids = [to_key_value(model._meta.pk, pk) for pk in ids]
+    except (ValidationError, ValueError, TypeError, OverflowError):
+        raise BadRequest('Invalid id')
+
+    found = {row['id']: row for row in model.objects.filter(pk__in=ids).order_by().values(*fields)}
+    rows = [found[pk] for pk in dict.fromkeys(ids) if pk in found]
+    return _response({
+        'data': rows,
+        'included': _side_load(resource, rows, included),
+        'missing': [pk for pk in dict.fromkeys(ids) if pk not in found],
+    })
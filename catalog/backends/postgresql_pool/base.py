@@ -0,0 +1,150 @@
+"""
+PostgreSQL with connections handed out from a pool per process instead of
+opened per thread: closing a connection (at the end of every request, with
+CONN_MAX_AGE = 0) gives it back for the next request of any thread.
+
+DATABASES entry: ENGINE 'catalog.backends.postgresql_pool', plus
+'POOL': {'min_size': 1, 'max_size': 10, 'timeout': 10}; a thread waits up
+to timeout seconds for a free connection once max_size are taken. The pool
+is made on the first connection, so with gunicorn every worker gets its
+own after the fork (unless --preload opens one in the master).
+"""
+import threading
+
+import psycopg2
+from django.db.backends.postgresql import base, creation
+from psycopg2 import Error, OperationalError, extensions, extras
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """
+    Up to max_size connections, opened when needed and kept open once given
+    back, min_size of them from the start; a thread waits for a free one
+    when all are out instead of failing straight away. (psycopg2's own pools
+    keep only minconn idle connections and close the others given back.)
+    """
+
+    def __init__(self, min_size, max_size, timeout, **conn_params):
+        self.database = conn_params.get('database')
+        self.timeout = timeout
+        self._conn_params = conn_params
+        self._idle = [psycopg2.connect(**conn_params) for _ in range(min_size)]
+        self._idle_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def getconn(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise OperationalError(f'No free connection in the pool after {self.timeout}s')
+        try:
+            with self._idle_lock:
+                if self._idle:
+                    return self._idle.pop()
+            return psycopg2.connect(**self._conn_params)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def putconn(self, connection, close=False):
+        # Rolls back an open transaction, drops a connection the server lost
+        try:
+            if not (close or connection.closed):
+                status = connection.info.transaction_status
+                if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                    close = True
+                elif status != extensions.TRANSACTION_STATUS_IDLE:
+                    try:
+                        connection.rollback()
+                    except Error:
+                        close = True
+            if close or connection.closed:
+                connection.close()
+            else:
+                with self._idle_lock:
+                    self._idle.append(connection)
+        finally:
+            self._slots.release()
+
+    def closeall(self):
+        with self._idle_lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+def get_pool(conn_params, options):
+    key = tuple(sorted(conn_params.items()))
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(options.get('min_size', 1), options.get('max_size', 10),
+                                         options.get('timeout', 10), **conn_params)
+        return _pools[key]
+
+
+def close_pools(database=None):
+    """
+    Closes the idle connections of every pool (of one database), for
+    dropping it or before forking.
+    """
+    with _pools_lock:
+        for key, connection_pool in list(_pools.items()):
+            if database is None or connection_pool.database == database:
+                connection_pool.closeall()
+                del _pools[key]
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Pooled connections to the test database would keep DROP DATABASE from running
+        close_pools(test_database_name)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def get_new_connection(self, conn_params):
+        self._connection_pool = get_pool(conn_params, self.settings_dict.get('POOL', {}))
+        connection = self._connection_pool.getconn()
+        # A pooled connection may have broken while it sat idle
+        if self.settings_dict.get('CONN_HEALTH_CHECKS') and not self._is_usable(connection):
+            self._connection_pool.putconn(connection, close=True)
+            connection = self._connection_pool.getconn()
+
+        # What the parent does to a new connection
+        try:
+            options = self.settings_dict['OPTIONS']
+            try:
+                self.isolation_level = options['isolation_level']
+            except KeyError:
+                self.isolation_level = connection.isolation_level
+            else:
+                if self.isolation_level != connection.isolation_level:
+                    connection.set_session(isolation_level=self.isolation_level)
+            extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+        except BaseException:
+            self._connection_pool.putconn(connection, close=True)
+            raise
+        return connection
+
+    @staticmethod
+    def _is_usable(connection):
+        if connection.closed:
+            return False
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if not connection.autocommit:
+                # Out of the transaction the SELECT began, so autocommit can be set
+                connection.rollback()
+        except Error:
+            return False
+        return True
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self._connection_pool.putconn(self.connection, close=bool(self.connection.closed))
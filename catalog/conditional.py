@@ -0,0 +1,72 @@
+import hashlib
+from calendar import timegm
+
+from django.db.models import Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .pagecache import permission_key, tag_versions
+
+
+class ConditionalGetMixin:
+    """
+    Answers If-None-Match / If-Modified-Since with 304 Not Modified from a
+    single version lookup, before the view loads anything or renders.
+
+    get_version() returns (last_modified, extra) or None when there is no
+    page to version; extra is mixed into the ETag. The ETag also depends on
+    the viewer, who is named in the page, so responses Vary on Cookie.
+    """
+
+    def get_version(self):
+        raise NotImplementedError('ConditionalGetMixin requires get_version()')
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+
+        version = self.get_version()
+        if version is None:
+            return super().dispatch(request, *args, **kwargs)
+
+        last_modified, extra = version
+        timestamp = timegm(last_modified.utctimetuple()) if last_modified else None
+        etag = quote_etag(hashlib.md5(
+            f'{last_modified and last_modified.isoformat()}:{extra}:{permission_key(request)}'.encode()
+        ).hexdigest())
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+            patch_vary_headers(response, ('Cookie',))
+        return response
+
+
+class ObjectVersionMixin(ConditionalGetMixin):
+    """
+    Version of a detail page: the last_modified of its object, which writes
+    to related rows move forward too (see catalog.signals.pages_changed).
+    """
+
+    def get_version(self):
+        last_modified = (self.model.objects.filter(pk=self.kwargs['pk'])
+                         .values_list('last_modified', flat=True).first())
+        if last_modified is None:
+            return None
+        return last_modified, ''
+
+
+class TableVersionMixin(ConditionalGetMixin):
+    """
+    Version of a list page: the newest last_modified in the table (MAX over
+    an index) and the page cache tag versions of the view, which deletions
+    bump as well. Needs CachedPageMixin.get_cache_tags().
+    """
+
+    def get_version(self):
+        last_modified = self.model.objects.aggregate(last_modified=Max('last_modified'))['last_modified']
+        return last_modified, '.'.join(str(version) for version in tag_versions(self.get_cache_tags()))
@@ -0,0 +1,107 @@
+import datetime
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Q
+
+from .models import Book, Author, BookInstance, Genre
+from .pagecache import invalidate_tags, tag_versions
+
+CACHE_KEY = 'catalog:counters'
+STATUS_CACHE_KEY = 'catalog:counters:status'
+# Snapshots are stored under the version of this tag, see catalog.pagecache
+CACHE_TAG = 'counters'
+# Only snapshots of versions nobody asks for any more ever get that old
+CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def _versioned_key(key):
+    """
+    The cache key of a snapshot for the current counters version. The version
+    is read before counting, so a snapshot counted from rows a write then
+    changed is stored under a version that write has already left behind.
+    """
+    version, = tag_versions([CACHE_TAG])
+    return f'{key}:{version}'
+
+
+def _counter_querysets():
+    """
+    The querysets behind the home page record counts, keyed by context name.
+    """
+    return {
+        'num_books': Book.objects.all(),
+        'num_instances': BookInstance.objects.all(),
+        'num_instances_available': BookInstance.objects.filter(status__exact='a'),
+        'num_authors': Author.objects.all(),
+        'num_genres': Genre.objects.filter(name__icontains='science'),
+    }
+
+
+def compute_counters():
+    """
+    Counts every catalog counter in a single SELECT made of scalar subqueries.
+    """
+    columns = []
+    params = []
+    for name, queryset in _counter_querysets().items():
+        sql, sql_params = queryset.order_by().values('pk').query.sql_with_params()
+        columns.append(f'(SELECT COUNT(*) FROM ({sql}) {name}_rows)')
+        params.extend(sql_params)
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT ' + ', '.join(columns), params)
+        row = cursor.fetchone()
+
+    return dict(zip(_counter_querysets(), row))
+
+
+def get_counters():
+    """
+    Returns the cached counters snapshot, computing it on a cache miss.
+    """
+    key = _versioned_key(CACHE_KEY)
+    counters = cache.get(key)
+    if counters is None:
+        counters = compute_counters()
+        cache.set(key, counters, CACHE_TIMEOUT)
+    return counters
+
+
+def compute_status_counts(today):
+    """
+    Copies per status, plus those on loan that were due before today under
+    'overdue', from one GROUP BY status over the (status, due_back) index.
+    """
+    rows = list(BookInstance.objects.order_by().values('status').annotate(
+        copies=Count('pk'),
+        overdue=Count('pk', filter=Q(status__exact='o', due_back__lt=today)),
+    ))
+    counts = {row['status']: row['copies'] for row in rows}
+    counts['overdue'] = sum(row['overdue'] for row in rows)
+    return counts
+
+
+def get_status_counts(today=None):
+    """
+    Returns the cached status counts, computing them on a cache miss or
+    when they were counted on another day.
+    """
+    today = today or datetime.date.today()
+    key = _versioned_key(STATUS_CACHE_KEY)
+    cached = cache.get(key)
+    if cached is not None and cached[0] == today:
+        return cached[1]
+    counts = compute_status_counts(today)
+    cache.set(key, (today, counts), CACHE_TIMEOUT)
+    return counts
+
+
+def invalidate_counters():
+    """
+    Moves the snapshots to a new version now and again once the surrounding
+    transaction commits; a reader that counted before the commit stores its
+    snapshot under the version in between, which no one reads afterwards.
+    """
+    invalidate_tags(CACHE_TAG)
+    transaction.on_commit(lambda: invalidate_tags(CACHE_TAG))
@@ -0,0 +1,34 @@
+import django
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    Applies settings.SQLITE_PRAGMAS to every new SQLite connection.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+
+
+@receiver(request_started)
+def check_connections(**kwargs):
+    """
+    CONN_HEALTH_CHECKS for Django 4.0, which ignores the setting: a kept
+    connection that broke between requests (a server restart, an idle
+    timeout) is closed here, so the request opens a new one instead of
+    failing on it.
+    """
+    if django.VERSION >= (4, 1):
+        return
+    for connection in connections.all():
+        if (connection.connection is not None and connection.settings_dict.get('CONN_HEALTH_CHECKS')
+                and not connection.is_usable()):
+            connection.close()
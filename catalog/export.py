@@ -0,0 +1,110 @@
+import csv
+import json
+from collections import defaultdict
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Book, Author, BookInstance, Genre
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def _books():
+    return Book.objects.order_by('pk').values(
+        'id', 'isbn', 'title', 'summary', 'author_id', 'author__first_name', 'author__last_name',
+        'copies_total', 'copies_available',
+    )
+
+
+def _add_genres(rows):
+    """
+    Flattens the genres of a chunk of book rows with one query for the chunk.
+    """
+    genres = defaultdict(list)
+    links = (Book.genre.through.objects.filter(book_id__in=[row['id'] for row in rows])
+             .order_by('genre__name').values_list('book_id', 'genre__name'))
+    for book_id, name in links:
+        genres[book_id].append(name)
+    for row in rows:
+        row['genres'] = '; '.join(genres[row['id']])
+    return rows
+
+
+# name: (queryset of .values() rows, per-chunk hook, output columns)
+RESOURCES = {
+    'books': (_books, _add_genres, [
+        'id', 'isbn', 'title', 'summary', 'author_id', 'author__first_name', 'author__last_name', 'genres',
+        'copies_total', 'copies_available',
+    ]),
+    'authors': (lambda: Author.objects.order_by('pk').values(), None, [
+        'id', 'first_name', 'last_name', 'date_of_birth', 'date_of_death',
+    ]),
+    'genres': (lambda: Genre.objects.order_by('pk').values(), None, ['id', 'name']),
+    'copies': (lambda: BookInstance.objects.order_by('pk').values(), None, [
+        'id', 'book_id', 'imprint', 'status', 'due_back', 'borrower_id',
+    ]),
+}
+
+
+def export_chunks(resource, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yields lists of at most chunk_size row dicts, read with a server-side
+    cursor where the backend has one, so memory use doesn't grow with the table.
+    """
+    queryset, hook, _ = RESOURCES[resource]
+    rows = queryset().iterator(chunk_size=chunk_size)
+    while chunk := list(islice(rows, chunk_size)):
+        yield hook(chunk) if hook else chunk
+
+
+class _Echo:
+    """
+    File-like object whose write() returns the value, for streaming csv.writer output.
+    """
+
+    def write(self, value):
+        return value
+
+
+def _csv(resource, chunk_size):
+    columns = RESOURCES[resource][2]
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for chunk in export_chunks(resource, chunk_size):
+        yield ''.join(writer.writerow([row[column] for column in columns]) for row in chunk)
+
+
+def _jsonl(resource, chunk_size):
+    columns = RESOURCES[resource][2]
+    for chunk in export_chunks(resource, chunk_size):
+        yield ''.join(
+            json.dumps({column: row[column] for column in columns}, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+            for row in chunk
+        )
+
+
+def _columns(resource, chunk_size):
+    """
+    Column-oriented JSONL: one line per chunk (a "row group", as in Parquet)
+    holding one array per column.
+    """
+    columns = RESOURCES[resource][2]
+    for chunk in export_chunks(resource, chunk_size):
+        group = {column: [row[column] for row in chunk] for column in columns}
+        yield json.dumps(group, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+FORMATS = {
+    'csv': (_csv, 'text/csv'),
+    'jsonl': (_jsonl, 'application/x-ndjson'),
+    'columns': (_columns, 'application/x-ndjson'),
+}
+
+
+def export(resource, output_format='csv', chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yields the export of one resource as text pieces, one per chunk.
+    """
+    render, _ = FORMATS[output_format]
+    return render(resource, chunk_size)
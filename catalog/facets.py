@@ -0,0 +1,96 @@
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import CharField, Count, Value
+from django.utils.http import urlencode
+
+from .models import Book
+from .pagecache import tag_versions
+
+# GET parameter: title
+FACETS = {
+    'language': 'Language',
+    'genre': 'Genre',
+}
+CACHE_PREFIX = 'catalog:facets:'
+# Only counts of versions nobody asks for any more ever get that old
+CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def selected_facets(params):
+    """
+    The ids picked for every facet in a QueryDict (?language=1&genre=2&genre=3);
+    values that aren't ids are ignored.
+    """
+    return {facet: sorted({int(value) for value in params.getlist(facet) if value.isdigit()}) for facet in FACETS}
+
+
+def filter_books(books, selected, skip=None):
+    """
+    Narrows books to the selection: any of the picked values of a facet, for
+    every facet with a pick. skip leaves out one facet, for its own counts.
+    """
+    if selected['language'] and skip != 'language':
+        books = books.filter(language__in=selected['language'])
+    if selected['genre'] and skip != 'genre':
+        # A subquery instead of a join, so no DISTINCT is needed
+        books = books.filter(pk__in=Book.genre.through.objects.filter(genre__in=selected['genre']).values('book_id'))
+    return books
+
+
+def compute_facet_counts(selected):
+    """
+    Books per language and per genre, each counted under the picks of the
+    other facet, from one query: a UNION ALL of two GROUP BYs.
+    """
+    languages = (filter_books(Book.objects.filter(language__isnull=False), selected, skip='language').order_by()
+                 .annotate(facet=Value('language', output_field=CharField()))
+                 .values_list('facet', 'language_id', 'language__name')
+                 .annotate(books=Count('pk')))
+    books = filter_books(Book.objects.order_by(), selected, skip='genre')
+    genres = (Book.genre.through.objects.filter(book__in=books.values('pk')).order_by()
+              .annotate(facet=Value('genre', output_field=CharField()))
+              .values_list('facet', 'genre_id', 'genre__name')
+              .annotate(books=Count('pk')))
+
+    counts = {facet: [] for facet in FACETS}
+    for facet, pk, name, number in languages.union(genres, all=True):
+        counts[facet].append((pk, name, number))
+    for choices in counts.values():
+        choices.sort(key=lambda choice: choice[1])
+    return counts
+
+
+def facet_counts(selected):
+    """
+    compute_facet_counts() through the cache. The key carries the version
+    of the 'books' page cache tag, which book, genre and language writes bump.
+    """
+    selection = urlencode(selected, doseq=True)
+    version, = tag_versions(['books'])
+    key = f'{CACHE_PREFIX}{hashlib.md5(selection.encode()).hexdigest()}:{version}'
+    counts = cache.get(key)
+    if counts is None:
+        counts = compute_facet_counts(selected)
+        cache.set(key, counts, CACHE_TIMEOUT)
+    return counts
+
+
+def facet_choices(selected):
+    """
+    The facets of the book list as template data: every value with its count,
+    whether it is picked and the query string that toggles it.
+    """
+    facets = []
+    for facet, choices in facet_counts(selected).items():
+        options = []
+        for pk, name, number in choices:
+            toggled = dict(selected, **{facet: sorted(set(selected[facet]) ^ {pk})})
+            options.append({
+                'name': name,
+                'books': number,
+                'selected': pk in selected[facet],
+                'query': urlencode(toggled, doseq=True),
+            })
+        facets.append({'name': facet, 'title': FACETS[facet], 'choices': options})
+    return facets
@@ -2,11 +2,14 @@ from django import forms
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 import datetime
+import uuid
 
 
 class RenewBookForm(forms.Form):
     renewal_date = forms.DateField(help_text='Enter a date between now and 4 '
                                              'weeks (default 3).')
+    # Version of the copy the form was opened on, see catalog.loans.renew
+    version = forms.IntegerField(widget=forms.HiddenInput, required=False)
 
     def clean_renewal_date(self):
         data = self.cleaned_data['renewal_date']
@@ -18,4 +21,43 @@ class RenewBookForm(forms.Form):
         return data
 
 
+class CopyIdsField(forms.Field):
+    """
+    The ids of the copies ticked in a list, as UUIDs.
+    """
+    widget = forms.MultipleHiddenInput
 
+    def to_python(self, value):
+        try:
+            return [uuid.UUID(str(copy_id)) for copy_id in value or []]
+        except ValueError:
+            raise ValidationError(_('Invalid copy selection'))
+
+
+class BulkLoanForm(RenewBookForm):
+    """
+    A renewal or a return of a set of copies. The renewal date follows the
+    RenewBookForm rules and is checked once for the whole set.
+    """
+    ACTIONS = (
+        ('renew', 'Renew'),
+        ('return', 'Mark returned'),
+    )
+
+    action = forms.ChoiceField(choices=ACTIONS)
+    copies = CopyIdsField()
+    renewal_date = forms.DateField(required=False, help_text='Enter a date between now and 4 '
+                                                             'weeks (default 3).')
+    version = None
+
+    def clean_renewal_date(self):
+        if self.cleaned_data['renewal_date'] is None:
+            return None
+        return super().clean_renewal_date()
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('action') == 'renew' and 'renewal_date' in cleaned_data \
+                and cleaned_data['renewal_date'] is None:
+            self.add_error('renewal_date', _('Enter the date to renew the copies to'))
+        return cleaned_data
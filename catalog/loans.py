@@ -0,0 +1,115 @@
+import datetime
+from collections import defaultdict
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .counters import invalidate_counters
+from .models import Book, BookInstance
+from .signals import invalidate_book_pages
+
+# SQLite's default limit on host parameters is 999
+BATCH_SIZE = 500
+
+
+def on_loan():
+    """
+    Copies out on loan, soonest due first.
+    """
+    return BookInstance.objects.filter(status__exact='o').order_by('due_back')
+
+
+def overdue_loans(today=None):
+    """
+    Copies on loan that were due before today. The predicate is on the
+    (status, due_back) index, unlike BookInstance.is_overdue.
+    """
+    return on_loan().filter(due_back__lt=today or datetime.date.today())
+
+
+def renew(book_instance, due_back, version=None):
+    """
+    Sets the due date of a copy with one UPDATE of due_back alone, so the
+    status and borrower written by others in the meantime are kept. With a
+    version, the UPDATE only applies if the copy is still at that version.
+
+    Returns False when the copy has changed (or gone) since; the instance
+    is then left as it was.
+    """
+    copies = BookInstance.objects.filter(pk=book_instance.pk)
+    if version is not None:
+        copies = copies.filter(version=version)
+    now = timezone.now()
+    if not copies.update(due_back=due_back, version=F('version') + 1, last_modified=now):
+        return False
+
+    # update() sends no signals; the Book counters don't depend on due_back,
+    # the overdue count does
+    invalidate_counters()
+    book_instance.due_back = due_back
+    book_instance.last_modified = now
+    book_instance.refresh_from_db(fields=['version'])
+    invalidate_book_pages([book_instance.book_id])
+    return True
+
+
+def _batches(copy_ids):
+    copy_ids = iter(copy_ids)
+    while batch := list(islice(copy_ids, BATCH_SIZE)):
+        yield batch
+
+
+def renew_many(copy_ids, due_back):
+    """
+    Sets the due date of the given copies that are on loan, with one UPDATE
+    ... WHERE id IN (...) per batch. Returns the number of copies renewed.
+    """
+    renewed = 0
+    book_ids = set()
+    for batch in _batches(copy_ids):
+        copies = BookInstance.objects.filter(pk__in=batch, status='o')
+        with transaction.atomic():
+            book_ids.update(copies.order_by().values_list('book_id', flat=True).distinct())
+            renewed += copies.update(due_back=due_back, version=F('version') + 1, last_modified=timezone.now())
+    invalidate_counters()
+    invalidate_book_pages(book_ids)
+    return renewed
+
+
+def return_many(copy_ids):
+    """
+    Marks the given copies as returned (available, without borrower or due
+    date) with one UPDATE ... WHERE id IN (...) per batch, and moves them
+    between the Book counters with one UPDATE per book. Returns the number
+    of copies returned.
+    """
+    returned = 0
+    book_ids = set()
+    for batch in _batches(copy_ids):
+        copies = BookInstance.objects.filter(pk__in=batch)
+        with transaction.atomic():
+            moved = defaultdict(dict)
+            for row in copies.order_by().values('book_id', 'status').annotate(copies=Count('pk')):
+                book_ids.add(row['book_id'])
+                if row['status'] != 'a':
+                    moved[row['book_id']][row['status']] = row['copies']
+            returned += copies.update(status='a', borrower=None, due_back=None,
+                                      version=F('version') + 1, last_modified=timezone.now())
+
+            # update() sends no signals: move the copies between the counters here
+            for book_id, statuses in moved.items():
+                if book_id is None:
+                    continue
+                changes = {'copies_available': F('copies_available') + sum(statuses.values())}
+                for status, count in statuses.items():
+                    counter = BookInstance.STATUS_COUNTERS.get(status)
+                    if counter:
+                        # Clamped like signals.adjust_copy_counters
+                        changes[counter] = Greatest(F(counter) - count, 0)
+                Book.objects.filter(pk=book_id).update(**changes)
+    invalidate_counters()
+    invalidate_book_pages(book_ids)
+    return returned
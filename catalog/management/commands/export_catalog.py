@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from catalog.export import DEFAULT_CHUNK_SIZE, FORMATS, RESOURCES, export
+
+
+class Command(BaseCommand):
+    help = 'Streams one catalog table as CSV, JSONL or column-oriented JSONL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('resource', choices=RESOURCES)
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--output', default='-', help='File to write, or "-" for standard output (default).')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help=f'Rows fetched per round trip (default {DEFAULT_CHUNK_SIZE}).')
+
+    def handle(self, *args, **options):
+        pieces = export(options['resource'], options['format'], options['chunk_size'])
+        if options['output'] == '-':
+            for piece in pieces:
+                self.stdout.write(piece, ending='')
+        else:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+                for piece in pieces:
+                    output.write(piece)
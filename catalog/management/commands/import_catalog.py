@@ -0,0 +1,206 @@
+import csv
+import json
+import sys
+from collections import Counter
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from catalog.counters import invalidate_counters
+from catalog.models import Author, Book, BookInstance, Genre
+from catalog.search import index_books
+from catalog.signals import adjust_copy_counters, invalidate_book_pages, pages_changed
+
+GENRE_SEPARATOR = ';'
+
+
+def read_csv(stream):
+    for row in csv.DictReader(stream):
+        row['genres'] = (row.get('genres') or '').split(GENRE_SEPARATOR)
+        yield row
+
+
+def read_jsonl(stream):
+    for number, line in enumerate(stream, 1):
+        if line.strip():
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as exc:
+                raise CommandError(f'Line {number} is not valid JSON: {exc.msg}.')
+            if not isinstance(row, dict):
+                raise CommandError(f'Line {number} is not a JSON object.')
+            if isinstance(row.get('genres'), str):
+                row['genres'] = row['genres'].split(GENRE_SEPARATOR)
+            yield row
+
+
+READERS = {'csv': read_csv, 'jsonl': read_jsonl}
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def create_returning_pks(model, objs, batch_size):
+    """
+    bulk_create() sets primary keys only where the backend can return them
+    from a bulk insert; elsewhere the rows are saved one at a time.
+    """
+    if connection.features.can_return_rows_from_bulk_insert:
+        model.objects.bulk_create(objs, batch_size=batch_size)
+    else:
+        for obj in objs:
+            obj.save()
+
+
+class Command(BaseCommand):
+    help = (
+        'Streams a CSV or JSONL file of acquisitions into the catalog. Each row has isbn, title, '
+        'summary, author_first_name, author_last_name, genres (";"-separated in CSV, a list in JSONL), '
+        'and optionally copies, imprint and status for the new BookInstance rows. Rows whose ISBN '
+        'is already catalogued only add copies.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import, or "-" for standard input.')
+        parser.add_argument('--format', choices=READERS, help='Input format (default: from the file extension).')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows read, and rows written per INSERT, in each batch (default 1000).')
+
+    def handle(self, *args, **options):
+        input_format = options['format'] or options['path'].rsplit('.', 1)[-1].lower()
+        if input_format not in READERS:
+            raise CommandError('Cannot tell the input format, pass --format csv or --format jsonl.')
+
+        self.batch_size = options['batch_size']
+        self.authors = {
+            (first_name, last_name): pk
+            for pk, first_name, last_name in Author.objects.values_list('pk', 'first_name', 'last_name').iterator()
+        }
+        self.genres = {name: pk for pk, name in Genre.objects.values_list('pk', 'name').iterator()}
+        self.stats = {'rows': 0, 'skipped': 0, 'books': 0, 'copies': 0}
+
+        stream = sys.stdin if options['path'] == '-' else open(options['path'], newline='', encoding='utf-8')
+        try:
+            for batch in batches(READERS[input_format](stream), self.batch_size):
+                with transaction.atomic():
+                    self.import_batch(batch)
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'{self.stats["rows"]} rows read')
+        except CommandError as exc:
+            # Each batch is committed on its own: the ones before the bad line stay
+            invalidate_counters()
+            raise CommandError(
+                f'{exc} The {self.stats["rows"]} rows of the batches before it were imported; '
+                'none of its batch or after it were.'
+            ) from exc
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        invalidate_counters()
+        self.stdout.write(self.style.SUCCESS(
+            'Imported {books} new books and {copies} copies from {rows} rows '
+            '({skipped} rows skipped).'.format(**self.stats)
+        ))
+
+    def import_batch(self, rows):
+        # One entry per ISBN: repeated rows within the batch only add copies
+        titles = {}
+        for row in rows:
+            self.stats['rows'] += 1
+            isbn = (row.get('isbn') or '').replace('-', '').strip()
+            title = (row.get('title') or '').strip()
+            status = row.get('status') or 'a'
+            try:
+                copies = int(row.get('copies') or 1)
+            except ValueError:
+                copies = -1
+            if (not isbn or not title or len(isbn) > Book._meta.get_field('isbn').max_length
+                    or status not in BookInstance.STATUS_COUNTERS or copies < 0):
+                self.stats['skipped'] += 1
+                continue
+            entry = titles.setdefault(isbn, {'row': row, 'title': title, 'copies': []})
+            entry['copies'] += [(row.get('imprint') or '', status)] * copies
+
+        # An index lookup per batch; where older rows share an ISBN, copies go to the first book
+        existing = dict(Book.objects.filter(isbn__in=list(titles)).order_by('-pk').values_list('isbn', 'pk'))
+        new_isbns = [isbn for isbn in titles if isbn not in existing]
+        self._create_authors([titles[isbn]['row'] for isbn in new_isbns])
+        self._create_genres([titles[isbn]['row'] for isbn in new_isbns])
+
+        books = []
+        for isbn in new_isbns:
+            entry = titles[isbn]
+            row = entry['row']
+            book = Book(
+                isbn=isbn,
+                title=entry['title'],
+                summary=row.get('summary') or '',
+                author_id=self.authors.get(self._author_key(row)),
+            )
+            # Counters of new books are set up front instead of by the signals
+            book.copies_total = len(entry['copies'])
+            for _, status in entry['copies']:
+                counter = BookInstance.STATUS_COUNTERS.get(status)
+                if counter:
+                    setattr(book, counter, getattr(book, counter) + 1)
+            books.append(book)
+        create_returning_pks(Book, books, self.batch_size)
+        self.stats['books'] += len(books)
+
+        book_ids = dict(existing)
+        book_ids.update((book.isbn, book.pk) for book in books)
+
+        genre_links = []
+        for book in books:
+            for name in self._genre_names(titles[book.isbn]['row']):
+                genre_links.append(Book.genre.through(book_id=book.pk, genre_id=self.genres[name]))
+        Book.genre.through.objects.bulk_create(genre_links, batch_size=self.batch_size, ignore_conflicts=True)
+
+        copies = [
+            BookInstance(book_id=book_ids[isbn], imprint=imprint, status=status)
+            for isbn, entry in titles.items() for imprint, status in entry['copies']
+        ]
+        BookInstance.objects.bulk_create(copies, batch_size=self.batch_size)
+        self.stats['copies'] += len(copies)
+
+        # bulk_create sends no signals: catch up the counters and pages of
+        # books that already existed, and the search index
+        added = Counter((book_id, status) for isbn, book_id in existing.items()
+                        for _, status in titles[isbn]['copies'])
+        for (book_id, status), count in added.items():
+            adjust_copy_counters(book_id, status, count)
+        invalidate_book_pages({book_id for book_id, _ in added})
+        if books:
+            pages_changed(author_ids={book.author_id for book in books}, lists=['books', 'authors'])
+        index_books([book.pk for book in books])
+
+    @staticmethod
+    def _author_key(row):
+        return (row.get('author_first_name') or '').strip(), (row.get('author_last_name') or '').strip()
+
+    @staticmethod
+    def _genre_names(row):
+        return {name.strip() for name in row.get('genres') or [] if name.strip()}
+
+    def _create_authors(self, rows):
+        new = {}
+        for row in rows:
+            key = self._author_key(row)
+            if any(key) and key not in self.authors and key not in new:
+                new[key] = Author(first_name=key[0], last_name=key[1])
+        create_returning_pks(Author, list(new.values()), self.batch_size)
+        self.authors.update((key, author.pk) for key, author in new.items())
+
+    def _create_genres(self, rows):
+        new = {}
+        for row in rows:
+            for name in self._genre_names(row):
+                if name not in self.genres and name not in new:
+                    new[name] = Genre(name=name)
+        create_returning_pks(Genre, list(new.values()), self.batch_size)
+        self.genres.update((name, genre.pk) for name, genre in new.items())
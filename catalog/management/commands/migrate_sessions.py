@@ -0,0 +1,38 @@
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        'Copies the unexpired sessions stored in the database into the cache of the cache or cached_db '
+        'session engine, so switching SESSION_ENGINE signs nobody out. Signed cookie sessions live in '
+        'the browser and cannot be filled in from the server.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--engine', default=settings.SESSION_ENGINE,
+                            help='Session engine module to copy into (default: SESSION_ENGINE).')
+
+    def handle(self, *args, **options):
+        engine = settings.SESSION_ENGINES.get(options['engine'], options['engine'])
+        store_class = import_module(engine).SessionStore
+        if engine == settings.SESSION_ENGINES['signed_cookies']:
+            raise CommandError('Signed cookie sessions are kept by the browsers; users will sign in again.')
+        if not hasattr(store_class, 'cache_key'):
+            self.stdout.write('This engine keeps sessions in the database, nothing to copy.')
+            return
+
+        cache = caches[settings.SESSION_CACHE_ALIAS]
+        now = timezone.now()
+        copied = 0
+        for session in Session.objects.filter(expire_date__gt=now).iterator():
+            # Stored the way the engine's save() stores it
+            cache.set(store_class(session_key=session.session_key).cache_key, session.get_decoded(),
+                      int((session.expire_date - now).total_seconds()))
+            copied += 1
+        self.stdout.write(self.style.SUCCESS(f'Copied {copied} sessions.'))
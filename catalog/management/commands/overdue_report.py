@@ -0,0 +1,72 @@
+import datetime
+from itertools import groupby, islice
+
+from django.conf import settings
+from django.core.mail import get_connection, send_mass_mail
+from django.core.management.base import BaseCommand
+
+from catalog.loans import overdue_loans
+
+DIGEST_SUBJECT = 'Overdue library books'
+
+
+def digest(borrower, loans, today):
+    lines = [f'Dear {borrower.get_full_name() or borrower.get_username()},', '',
+             'The following books you borrowed are overdue:', '']
+    for loan in loans:
+        lines.append(f'- {loan.book.title if loan.book else "Unknown book"} '
+                     f'(due {loan.due_back:%Y-%m-%d}, {(today - loan.due_back).days} days late)')
+    lines += ['', 'Please return or renew them.']
+    return '\n'.join(lines)
+
+
+class Command(BaseCommand):
+    help = (
+        'Reports the loans that are overdue, grouped by borrower, and mails each borrower one digest '
+        'through EMAIL_BACKEND over a single connection.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=datetime.date.fromisoformat,
+                            help='Report as of this date, YYYY-MM-DD (default: today).')
+        parser.add_argument('--no-mail', action='store_true', help='Only print the report.')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Digests handed to the mail backend at a time (default 500).')
+
+    def handle(self, *args, **options):
+        today = options['date'] or datetime.date.today()
+        # One pass over the overdue loans, already grouped by the ORDER BY
+        loans = (overdue_loans(today).filter(borrower__isnull=False)
+                 .select_related('book', 'borrower')
+                 .only('due_back', 'book__title', 'borrower__username', 'borrower__first_name',
+                       'borrower__last_name', 'borrower__email')
+                 .order_by('borrower_id', 'due_back'))
+
+        stats = {'loans': 0, 'borrowers': 0, 'mailed': 0, 'no_email': 0}
+
+        def digests():
+            for _, group in groupby(loans.iterator(), key=lambda loan: loan.borrower_id):
+                group = list(group)
+                borrower = group[0].borrower
+                stats['loans'] += len(group)
+                stats['borrowers'] += 1
+                self.stdout.write(f'{borrower.get_username()}: {len(group)} overdue, '
+                                  f'oldest due {group[0].due_back:%Y-%m-%d}')
+                if not borrower.email:
+                    stats['no_email'] += 1
+                    continue
+                yield DIGEST_SUBJECT, digest(borrower, group, today), settings.DEFAULT_FROM_EMAIL, [borrower.email]
+
+        if options['no_mail']:
+            for _ in digests():
+                pass
+        else:
+            with get_connection() as connection:
+                messages = digests()
+                while batch := list(islice(messages, options['batch_size'])):
+                    stats['mailed'] += send_mass_mail(batch, connection=connection)
+
+        self.stdout.write(self.style.SUCCESS(
+            '{loans} overdue loans of {borrowers} borrowers; {mailed} digests sent, '
+            '{no_email} borrowers without an email address.'.format(**stats)
+        ))
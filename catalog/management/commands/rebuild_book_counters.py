@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+
+from catalog.models import Book, BookInstance
+
+COUNTER_FIELDS = ['copies_total', *BookInstance.STATUS_COUNTERS.values()]
+
+
+def counted_books():
+    """
+    Books annotated with their real copy counts from one grouped query.
+    """
+    annotations = {'real_copies_total': Count('bookinstance')}
+    for status, field in BookInstance.STATUS_COUNTERS.items():
+        annotations[f'real_{field}'] = Count('bookinstance', filter=Q(bookinstance__status__exact=status))
+    return Book.objects.order_by('pk').only('pk', *COUNTER_FIELDS).annotate(**annotations)
+
+
+class Command(BaseCommand):
+    help = 'Recounts the copy counters stored on Book and reports the books that had drifted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Books read and written per batch (default 1000).')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report drift, do not write.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        checked = 0
+        self.drift_count = 0
+        drifted = []
+
+        for book in counted_books().iterator(chunk_size=batch_size):
+            checked += 1
+            changed = False
+            for field in COUNTER_FIELDS:
+                real = getattr(book, f'real_{field}')
+                if getattr(book, field) != real:
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f'Book {book.pk}: {field} {getattr(book, field)} -> {real}')
+                    setattr(book, field, real)
+                    changed = True
+            if changed:
+                drifted.append(book)
+            if len(drifted) >= batch_size:
+                self._write(drifted, options['dry_run'])
+                drifted = []
+        self._write(drifted, options['dry_run'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {checked} books, {self.drift_count} had drifted'
+            f'{" (dry run, nothing written)" if options["dry_run"] else ""}.'
+        ))
+
+    def _write(self, books, dry_run):
+        self.drift_count += len(books)
+        if books and not dry_run:
+            with transaction.atomic():
+                Book.objects.bulk_update(books, COUNTER_FIELDS)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from catalog.search import is_available, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index of the catalog in bulk.'
+
+    def handle(self, *args, **options):
+        if not is_available():
+            self.stdout.write('The search index needs SQLite FTS5; this database uses LIKE lookups instead.')
+            return
+        with transaction.atomic():
+            indexed = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} books.'))
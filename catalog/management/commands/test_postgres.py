@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.testing import temporary_postgres
+
+
+class Command(BaseCommand):
+    help = (
+        'Starts a throwaway PostgreSQL server (initdb and pg_ctl from PG_BIN or the PATH) and runs '
+        'manage.py test against it through DATABASE_URL; needs psycopg2 and dj-database-url.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('test_labels', nargs='*', help='Passed on to manage.py test.')
+        parser.add_argument('--pool-size', type=int, default=0,
+                            help='Run through the pooled backend with this many connections (default: no pool).')
+        parser.add_argument('--pg-bin', help='Directory of the PostgreSQL programs.')
+
+    def handle(self, *args, **options):
+        try:
+            with temporary_postgres(bin_dir=options['pg_bin']) as server:
+                env = dict(os.environ, DATABASE_URL=f'{server}/locallibrary',
+                           DJANGO_DB_POOL_SIZE=str(options['pool_size']))
+                # A new process, since the settings read DATABASE_URL on startup
+                result = subprocess.run(
+                    [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'test', *options['test_labels'],
+                     f'--verbosity={options["verbosity"]}'],
+                    env=env, cwd=settings.BASE_DIR,
+                )
+        except (FileNotFoundError, subprocess.CalledProcessError) as e:
+            raise CommandError(f'Could not start PostgreSQL: {e}')
+        if result.returncode:
+            raise CommandError(f'Tests failed on PostgreSQL (exit status {result.returncode}).')
@@ -0,0 +1,17 @@
+# Generated by Django 4.0.6 on 2026-10-17 13:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0007_bookinstance_loan_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='book',
+            options={'ordering': ['title', 'author']},
+        ),
+    ]
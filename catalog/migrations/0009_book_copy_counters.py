@@ -0,0 +1,63 @@
+# Generated by Django 4.0.6 on 2026-10-17 13:22
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+STATUS_COUNTERS = {
+    'm': 'copies_maintenance',
+    'o': 'copies_on_loan',
+    'a': 'copies_available',
+    'r': 'copies_reserved',
+}
+
+
+def count_copies(apps, schema_editor):
+    Book = apps.get_model('catalog', 'Book')
+    BookInstance = apps.get_model('catalog', 'BookInstance')
+
+    def copies(**filters):
+        counted = (BookInstance.objects.filter(book=OuterRef('pk'), **filters).order_by()
+                   .values('book').annotate(n=Count('pk')).values('n'))
+        return Coalesce(Subquery(counted), Value(0))
+
+    changes = {'copies_total': copies()}
+    for status, field in STATUS_COUNTERS.items():
+        changes[field] = copies(status=status)
+    Book.objects.update(**changes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0008_alter_book_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='copies_available',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='copies_maintenance',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='copies_on_loan',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='copies_reserved',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='copies_total',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_copies, migrations.RunPython.noop),
+    ]
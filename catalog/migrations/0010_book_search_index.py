@@ -0,0 +1,37 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE catalog_book_fts USING fts5("
+        "title, author, genre, isbn, summary, tokenize='unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute("""
+        INSERT INTO catalog_book_fts(rowid, title, author, genre, isbn, summary)
+        SELECT b.id, b.title,
+               COALESCE(a.first_name || ' ' || a.last_name, ''),
+               COALESCE((SELECT group_concat(g.name, ' ')
+                         FROM catalog_book_genre bg JOIN catalog_genre g ON g.id = bg.genre_id
+                         WHERE bg.book_id = b.id), ''),
+               b.isbn, b.summary
+        FROM catalog_book b LEFT JOIN catalog_author a ON a.id = b.author_id
+    """)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS catalog_book_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0009_book_copy_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.0.6 on 2026-10-17 13:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0010_book_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='last_modified',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='last_modified',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='bookinstance',
+            name='last_modified',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
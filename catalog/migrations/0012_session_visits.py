@@ -0,0 +1,21 @@
+# Generated by Django 4.0.6 on 2026-10-17 13:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0011_last_modified'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionVisits',
+            fields=[
+                ('session_key', models.CharField(max_length=40, primary_key=True, serialize=False)),
+                ('visits', models.PositiveIntegerField(default=0)),
+                ('last_visit', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.6 on 2026-10-17 13:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0012_session_visits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookinstance',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
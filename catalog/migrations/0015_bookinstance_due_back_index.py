@@ -0,0 +1,17 @@
+# Generated by Django 4.0.6 on 2026-10-17 13:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0014_language'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bookinstance',
+            index=models.Index(fields=['due_back'], name='bookinst_due_idx'),
+        ),
+    ]
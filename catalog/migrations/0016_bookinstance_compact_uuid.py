@@ -0,0 +1,54 @@
+# Generated by Django 4.0.6 on 2026-10-17 13:56
+
+import uuid
+
+import catalog.uuids
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def ids_to_binary(apps, schema_editor):
+    """
+    Rewrites the ids, copied into the BLOB column as 32 hex digits, as their
+    16 bytes. The values stay the same, so /catalog/book/<uuid>/renew/ and
+    other links to a copy keep working.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        # Already a 16 byte native uuid column
+        return
+    with schema_editor.connection.cursor() as cursor:
+        # Walked in rowid order from where the last batch stopped, so every
+        # batch is a range read instead of a scan past the rows already done
+        last_rowid = 0
+        while True:
+            cursor.execute('SELECT rowid, id FROM catalog_bookinstance WHERE rowid > %s ORDER BY rowid LIMIT %s',
+                           [last_rowid, BATCH_SIZE])
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            last_rowid = rows[-1][0]
+            cursor.executemany('UPDATE catalog_bookinstance SET id = %s WHERE rowid = %s',
+                               [(uuid.UUID(hex=pk).bytes, rowid) for rowid, pk in rows if isinstance(pk, str)])
+
+
+def ids_to_text(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("UPDATE catalog_bookinstance SET id = lower(hex(id)) WHERE typeof(id) = 'blob'")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0015_bookinstance_due_back_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bookinstance',
+            name='id',
+            field=catalog.uuids.CompactUUIDField(default=catalog.uuids.new_copy_id, help_text='Unique ID for this particular book acrosswhole library', primary_key=True, serialize=False),
+        ),
+        migrations.RunPython(ids_to_binary, ids_to_text),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.0.6 on 2026-10-17 14:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0017_book_isbn_index'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='author',
+            options={'ordering': ['last_name', 'first_name']},
+        ),
+        migrations.AlterModelOptions(
+            name='book',
+            options={'ordering': ['title', 'author_id']},
+        ),
+        migrations.AddIndex(
+            model_name='author',
+            index=models.Index(fields=['last_name', 'first_name', 'id'], name='author_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['title', 'author', 'id'], name='book_title_author_idx'),
+        ),
+    ]
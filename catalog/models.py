@@ -1,8 +1,10 @@
-from django.db import models
+from django.db import DatabaseError, models, transaction
+from django.db.models import DEFERRED
 from django.urls import reverse
 from django.contrib.auth.models import User
 from datetime import date
-import uuid
+
+from .uuids import CompactUUIDField, new_copy_id
 
 
 # Create your models here.
@@ -21,6 +23,23 @@ class Genre(models.Model):
         return self.name
 
 
+class Language(models.Model):
+    """
+    Model representing a natural language a book is written in (e.g. English, French).
+    """
+    name = models.CharField(max_length=200, unique=True,
+                            help_text="Enter the book's natural language (e.g. English, French, Japanese etc.)")
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        """
+        String for representing the Model object (in Admin site etc.)
+        """
+        return self.name
+
+
 class Book(models.Model):
     """
     Model representing a book (but not a specific copy of a book).
@@ -28,10 +47,33 @@ class Book(models.Model):
     title = models.CharField(max_length=200)
     author = models.ForeignKey('Author', on_delete=models.SET_NULL, null=True)
     summary = models.TextField(max_length=1000, help_text="Enter a brief description of the book")
-    isbn = models.CharField('ISBN', max_length=13, help_text='13 '
+    # Indexed for the ISBN lookups of import_catalog; not unique, older rows may repeat one
+    isbn = models.CharField('ISBN', max_length=13, db_index=True, help_text='13 '
                                                              'Character <a href="https://www.isbn-'
                                                              'international.org/content/what-isbn">ISBN number</a>')
     genre = models.ManyToManyField(Genre, help_text="Select a genre for this book")
+    language = models.ForeignKey('Language', on_delete=models.SET_NULL, null=True, blank=True)
+
+    # Copy counters, maintained from BookInstance writes (see catalog.signals)
+    # and rebuilt by the rebuild_book_counters command.
+    copies_total = models.PositiveIntegerField(default=0, editable=False)
+    copies_available = models.PositiveIntegerField(default=0, editable=False)
+    copies_on_loan = models.PositiveIntegerField(default=0, editable=False)
+    copies_reserved = models.PositiveIntegerField(default=0, editable=False)
+    copies_maintenance = models.PositiveIntegerField(default=0, editable=False)
+    COPY_COUNTERS = ('copies_total', 'copies_available', 'copies_on_loan', 'copies_reserved', 'copies_maintenance')
+
+    # Also moved forward when a copy, the author or a genre of the book changes
+    last_modified = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        # author_id rather than author, which would sort by the author's name
+        # through a join; CursorPaginator seeks on the same columns
+        ordering = ['title', 'author_id']
+        indexes = [
+            # The default ordering with the primary key the cursor pages break ties on
+            models.Index(fields=['title', 'author', 'id'], name='book_title_author_idx'),
+        ]
 
     def __str__(self):
         """
@@ -53,13 +95,30 @@ class Book(models.Model):
 
     display_genre.short_description = 'Genre'
 
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        """
+        Leaves the copy counters out of the UPDATE of an existing book: they
+        are only written as x = x + 1 by the copy signals and by
+        rebuild_book_counters, never from what an instance read earlier.
+        """
+        values = [value for value in values if value[0].attname not in self.COPY_COUNTERS]
+        return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+
+
+class StaleVersionError(DatabaseError):
+    """
+    Raised by BookInstance.save() when the copy was written by someone else
+    since it was read.
+    """
+
 
 class BookInstance(models.Model):
     """
     Model representing a specific copy of the book (i.e that can be borrowed from the library).
     """
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, help_text='Unique ID for this particular book across'
-                                                                          'whole library')
+    # Time-ordered ids in 16 bytes, see catalog.uuids
+    id = CompactUUIDField(primary_key=True, default=new_copy_id, help_text='Unique ID for this particular book across'
+                                                                           'whole library')
     book = models.ForeignKey('Book', on_delete=models.SET_NULL, null=True)
     imprint = models.CharField(max_length=200)
     due_back = models.DateField(null=True, blank=True)
@@ -73,10 +132,28 @@ class BookInstance(models.Model):
     )
 
     status = models.CharField(max_length=1, choices=LOAN_STATUS, blank=True, help_text='Book availability')
+    last_modified = models.DateTimeField(auto_now=True)
+    # Bumped by every write, so an edit based on an older read can tell (see catalog.loans)
+    version = models.PositiveIntegerField(default=0, editable=False)
+
+    # Book counter column for every status (a blank status only counts in copies_total)
+    STATUS_COUNTERS = {
+        'm': 'copies_maintenance',
+        'o': 'copies_on_loan',
+        'a': 'copies_available',
+        'r': 'copies_reserved',
+    }
 
     class Meta:
         ordering = ['due_back']
         permissions = (('can_mark_returned', 'Set book as returned'),)
+        indexes = [
+            # Loan lists filter by status (and borrower) and order by due_back
+            models.Index(fields=['status', 'due_back'], name='bookinst_status_due_idx'),
+            models.Index(fields=['borrower', 'status', 'due_back'], name='bookinst_borrower_due_idx'),
+            # The admin due_back filter and default ordering, across statuses
+            models.Index(fields=['due_back'], name='bookinst_due_idx'),
+        ]
 
     def __str__(self):
         """
@@ -84,6 +161,46 @@ class BookInstance(models.Model):
         """
         return f'{self.id} ({self.book})' #.title?
 
+    def save(self, *args, **kwargs):
+        self.version += 1
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        try:
+            # The post_save handler updating Book counters runs in the same transaction
+            with transaction.atomic(using=kwargs.get('using')):
+                super().save(*args, **kwargs)
+        except Exception:
+            # Nothing was written
+            self.version -= 1
+            raise
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        """
+        Updates the row only if it is still at the version this instance was
+        read at, so a save based on an older read can't overwrite a newer
+        write; raises StaleVersionError when it isn't.
+        """
+        if super()._do_update(base_qs.filter(version=self.version - 1), using, pk_val, values, update_fields,
+                              forced_update):
+            return True
+        if base_qs.filter(pk=pk_val).exists():
+            raise StaleVersionError(f'Copy {pk_val} has changed since it was read')
+        # Deleted meanwhile; save() goes on to insert it, as for any model
+        return False
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        if fields is None:
+            self._snapshot()
+
+    def _snapshot(self):
+        """
+        Remembers the stored book and status, which the copy counters go by
+        (see catalog.signals). Read from __dict__ so a deferred field isn't
+        fetched just to remember it.
+        """
+        self._counted_state = (self.__dict__.get('book_id', DEFERRED), self.__dict__.get('status', DEFERRED))
+
     @property
     def is_overdue(self):
         """Determines if the book is overdue based on due date and current date."""
@@ -98,6 +215,8 @@ class Author(models.Model):
     last_name = models.CharField(max_length=100)
     date_of_birth = models.DateField(null=True, blank=True)
     date_of_death = models.DateField('died', null=True, blank=True)
+    # Also moved forward when one of the author's books changes
+    last_modified = models.DateTimeField(auto_now=True, db_index=True)
 
     def get_absolute_url(self):
         """
@@ -112,4 +231,20 @@ class Author(models.Model):
         return f'{self.last_name}, {self.first_name}'
 
     class Meta:
-        ordering = ['last_name']
+        ordering = ['last_name', 'first_name']
+        indexes = [
+            # The default ordering with the primary key the cursor pages break ties on
+            models.Index(fields=['last_name', 'first_name', 'id'], name='author_name_idx'),
+        ]
+
+
+class SessionVisits(models.Model):
+    """
+    Home page visits of a session, written in bulk by catalog.visits
+    """
+    session_key = models.CharField(max_length=40, primary_key=True)
+    visits = models.PositiveIntegerField(default=0)
+    last_visit = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f'{self.session_key}: {self.visits}'
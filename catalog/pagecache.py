@@ -0,0 +1,93 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+TAG_PREFIX = 'catalog:tag:'
+PAGE_PREFIX = 'catalog:page:'
+
+
+def _new_version():
+    # Time based, so a version lost from the cache never comes back as an old value
+    return time.time_ns()
+
+
+def tag_versions(tags):
+    """
+    Current version of every tag, with one cache round trip when all are known.
+    """
+    keys = [TAG_PREFIX + tag for tag in tags]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _new_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def invalidate_tags(*tags):
+    """
+    Bumps the version of each tag, so every cached page that depends on one
+    of them gets a new key; other pages are untouched.
+    """
+    for tag in tags:
+        key = TAG_PREFIX + tag
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_version(), timeout=None)
+
+
+def permission_key(request):
+    """
+    The part of a page that depends on who is looking: the catalog templates
+    show the user name and branch on can_mark_returned.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return 'anon'
+    return f'user{user.pk}:{int(user.has_perm("catalog.can_mark_returned"))}'
+
+
+def page_cache_key(request, tags):
+    url = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    versions = '.'.join(str(version) for version in tag_versions(tags))
+    return f'{PAGE_PREFIX}{url}:{permission_key(request)}:{versions}'
+
+
+class CachedPageMixin:
+    """
+    Caches the rendered GET response of a view under its URL (page number
+    included), the viewer's permission key and the versions of the tags from
+    get_cache_tags(). Writes invalidate tags, see catalog.signals.
+    """
+    cache_timeout = None
+
+    def get_cache_tags(self):
+        raise NotImplementedError('CachedPageMixin requires get_cache_tags()')
+
+    def get_cache_timeout(self):
+        if self.cache_timeout is None:
+            return getattr(settings, 'CATALOG_PAGE_CACHE_TIMEOUT', 600)
+        return self.cache_timeout
+
+    def dispatch(self, request, *args, **kwargs):
+        timeout = self.get_cache_timeout()
+        if request.method not in ('GET', 'HEAD') or not timeout:
+            return super().dispatch(request, *args, **kwargs)
+
+        key = page_cache_key(request, self.get_cache_tags())
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200 and hasattr(response, 'add_post_render_callback'):
+            def store(response):
+                if not response.cookies:
+                    cache.set(key, (response.content, response['Content-Type']), timeout)
+            response.add_post_render_callback(store)
+        return response
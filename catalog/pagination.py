@@ -0,0 +1,185 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import F, Q
+from django.http import Http404
+
+# The integers SQLite can bind as a parameter
+MIN_INTEGER, MAX_INTEGER = -2 ** 63, 2 ** 63 - 1
+
+
+def to_key_value(field, value):
+    """
+    A value sent by a client (in a cursor or a list of ids) converted for
+    comparing against field. Raises ValidationError, ValueError, TypeError or
+    OverflowError when it can't be.
+    """
+    value = field.to_python(value)
+    if isinstance(value, int) and not MIN_INTEGER <= value <= MAX_INTEGER:
+        raise ValidationError('Integer out of range')
+    return value
+
+
+class CursorPage:
+    """
+    One page of a keyset scan. Unlike django.core.paginator.Page it knows
+    nothing about the total number of rows or pages.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Keyset ("seek") paginator. Pages are fetched with a WHERE on the ordering
+    keys of the last row seen instead of an OFFSET, so every page costs the
+    same, and no COUNT(*) is run.
+
+    The keys are the model's Meta.ordering (or ``ordering``) followed by the
+    primary key as a tie breaker. NULLs sort where the database puts them in
+    a plain ORDER BY (below any value on SQLite, above on PostgreSQL), so the
+    pages follow Meta.ordering and can be read off an index on the keys.
+    """
+
+    def __init__(self, queryset, per_page, ordering=None):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        opts = queryset.model._meta
+        self.nulls_largest = connections[queryset.db].features.nulls_order_largest
+        if ordering is None:
+            ordering = opts.ordering
+        self.keys = []
+        self.key_fields = []
+        for name in ordering:
+            descending = name.startswith('-')
+            field = opts.get_field(name.lstrip('-'))
+            self.keys.append((field.attname, descending))
+            self.key_fields.append(field)
+        if opts.pk.attname not in [attname for attname, _ in self.keys]:
+            self.keys.append((opts.pk.attname, False))
+            self.key_fields.append(opts.pk)
+
+    def encode_cursor(self, obj, backwards=False):
+        # Rows of .values() querysets are dicts
+        if isinstance(obj, dict):
+            values = [obj[attname] for attname, _ in self.keys]
+        else:
+            values = [getattr(obj, attname) for attname, _ in self.keys]
+        payload = json.dumps({'v': values, 'b': backwards}, cls=DjangoJSONEncoder)
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            values, backwards = payload['v'], bool(payload['b'])
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise InvalidPage('Invalid cursor')
+        if not isinstance(values, list) or len(values) != len(self.keys):
+            raise InvalidPage('Invalid cursor')
+        # The values come from the client, they go into the WHERE of _seek
+        try:
+            values = [None if value is None else to_key_value(field, value)
+                      for field, value in zip(self.key_fields, values)]
+        except (ValidationError, ValueError, TypeError, OverflowError):
+            raise InvalidPage('Invalid cursor')
+        return values, backwards
+
+    def _order_by(self, backwards):
+        order_by = []
+        for attname, descending in self.keys:
+            order_by.append(F(attname).desc() if descending != backwards else F(attname).asc())
+        return order_by
+
+    def _seek(self, values, backwards):
+        """
+        Rows strictly past ``values`` in scan order:
+        (k1 > v1) OR (k1 = v1 AND k2 > v2) OR ...
+        """
+        condition = Q(pk__in=[])
+        equal = Q()
+        for (attname, descending), value in zip(self.keys, values):
+            ascending = descending == backwards
+            nulls_first = ascending != self.nulls_largest
+            if value is None:
+                beyond = Q(**{f'{attname}__isnull': False}) if nulls_first else Q(pk__in=[])
+            else:
+                beyond = Q(**{f'{attname}__gt' if ascending else f'{attname}__lt': value})
+                if not nulls_first:
+                    beyond |= Q(**{f'{attname}__isnull': True})
+            condition |= equal & beyond
+            equal &= Q(**{f'{attname}__isnull': True}) if value is None else Q(**{attname: value})
+        return condition
+
+    def page(self, cursor=None):
+        backwards = False
+        queryset = self.queryset
+        if cursor:
+            values, backwards = self.decode_cursor(cursor)
+            queryset = queryset.filter(self._seek(values, backwards))
+
+        rows = list(queryset.order_by(*self._order_by(backwards))[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or backwards:
+                next_cursor = self.encode_cursor(rows[-1])
+            if (has_more and backwards) or (cursor and not backwards):
+                previous_cursor = self.encode_cursor(rows[0], backwards=True)
+        return CursorPage(rows, self, next_cursor, previous_cursor)
+
+
+class CursorPaginationMixin:
+    """
+    Opt-in keyset pagination for ListView. With ``cursor_pagination`` on (or
+    left as None and settings.CATALOG_CURSOR_PAGINATION on) pages are
+    addressed by ``?cursor=`` instead of ``?page=``.
+    """
+    cursor_pagination = None
+    cursor_kwarg = 'cursor'
+
+    def get_cursor_pagination(self):
+        if self.cursor_pagination is None:
+            return getattr(settings, 'CATALOG_CURSOR_PAGINATION', False)
+        return self.cursor_pagination
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.get_cursor_pagination():
+            return super().paginate_queryset(queryset, page_size)
+
+        paginator = CursorPaginator(queryset, page_size)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidPage as e:
+            raise Http404(str(e))
+        return paginator, page, page.object_list, page.has_other_pages()
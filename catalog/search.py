@@ -0,0 +1,148 @@
+from django.db import connection
+from django.db.models import Q
+
+from .models import Book
+
+FTS_TABLE = 'catalog_book_fts'
+
+# bm25() weights, in the column order of FTS_TABLE
+COLUMN_WEIGHTS = (
+    ('title', 10.0),
+    ('author', 5.0),
+    ('genre', 2.0),
+    ('isbn', 3.0),
+    ('summary', 1.0),
+)
+
+CREATE_FTS_TABLE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"{', '.join(column for column, _ in COLUMN_WEIGHTS)}, tokenize='unicode61 remove_diacritics 2')"
+)
+DROP_FTS_TABLE = f'DROP TABLE IF EXISTS {FTS_TABLE}'
+
+# One FTS row per book: author name and genre names are flattened in SQL, so
+# indexing any number of books is a single INSERT ... SELECT.
+INDEX_SELECT = f"""
+    SELECT b.id, b.title,
+           COALESCE(a.first_name || ' ' || a.last_name, ''),
+           COALESCE((SELECT group_concat(g.name, ' ')
+                     FROM catalog_book_genre bg JOIN catalog_genre g ON g.id = bg.genre_id
+                     WHERE bg.book_id = b.id), ''),
+           b.isbn, b.summary
+    FROM catalog_book b LEFT JOIN catalog_author a ON a.id = b.author_id
+"""
+INSERT_INTO_FTS = f"INSERT INTO {FTS_TABLE}(rowid, {', '.join(column for column, _ in COLUMN_WEIGHTS)})"
+
+# SQLite's default limit on host parameters is 999
+ID_BATCH_SIZE = 500
+
+
+def is_available():
+    """
+    The FTS5 index only exists on SQLite; other backends fall back to LIKE.
+    """
+    return connection.vendor == 'sqlite'
+
+
+def index_books(book_ids):
+    """
+    (Re)indexes the given books, dropping the entries of books that no longer exist.
+    """
+    if not is_available():
+        return
+    book_ids = list(book_ids)
+    with connection.cursor() as cursor:
+        for start in range(0, len(book_ids), ID_BATCH_SIZE):
+            batch = book_ids[start:start + ID_BATCH_SIZE]
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', batch)
+            cursor.execute(f'{INSERT_INTO_FTS} {INDEX_SELECT} WHERE b.id IN ({placeholders})', batch)
+
+
+def rebuild_index():
+    """
+    Reindexes the whole catalog in bulk and returns the number of books indexed.
+    """
+    if not is_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(CREATE_FTS_TABLE)
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(f'{INSERT_INTO_FTS} {INDEX_SELECT}')
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT COUNT(*) FROM {FTS_TABLE}')
+        return cursor.fetchone()[0]
+
+
+def match_expression(query):
+    """
+    Turns free text into an FTS5 MATCH expression: every word must occur, the
+    last one may be a prefix. Words are quoted so FTS5 operators in user input
+    are taken literally.
+    """
+    words = query.split()
+    if not words:
+        return None
+    terms = ['"{}"'.format(word.replace('"', '""')) for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+class SearchResults:
+    """
+    Lazy, ranked search results. Supports count() and slicing, which is all
+    django.core.paginator.Paginator needs, so only the requested page of ids
+    is read from the index and only those books are loaded.
+    """
+
+    def __init__(self, query):
+        self.query = query
+        self.expression = match_expression(query)
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            if self.expression is None:
+                self._count = 0
+            elif is_available():
+                with connection.cursor() as cursor:
+                    cursor.execute(f'SELECT COUNT(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+                                   [self.expression])
+                    self._count = cursor.fetchone()[0]
+            else:
+                self._count = self._fallback().count()
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start = key.start or 0
+        stop = key.stop if key.stop is not None else self.count()
+        if self.expression is None or stop <= start:
+            return []
+        if not is_available():
+            return list(self._fallback()[start:stop])
+
+        weights = ', '.join(str(weight) for _, weight in COLUMN_WEIGHTS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s OFFSET %s',
+                [self.expression, stop - start, start],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        books = Book.objects.select_related('author').in_bulk(ids)
+        return [books[pk] for pk in ids if pk in books]
+
+    def _fallback(self):
+        books = Book.objects.select_related('author')
+        for word in self.query.split():
+            books = books.filter(
+                Q(title__icontains=word) | Q(summary__icontains=word) | Q(isbn__iexact=word)
+                | Q(author__first_name__icontains=word) | Q(author__last_name__icontains=word)
+                | Q(genre__name__icontains=word)
+            )
+        return books.distinct()
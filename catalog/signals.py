@@ -0,0 +1,197 @@
+from django.db.models import F, DEFERRED
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_init, pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .counters import invalidate_counters
+from .models import Book, Author, BookInstance, Genre, Language
+from .pagecache import invalidate_tags
+from .search import index_books
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=BookInstance)
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=BookInstance)
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Genre)
+def catalog_changed(sender, **kwargs):
+    """
+    Any write to a counted model makes the home page counters stale.
+    """
+    invalidate_counters()
+
+
+def adjust_copy_counters(book_id, status, delta, using=None):
+    """
+    Adds delta to the total and per-status copy counters of one book with a
+    single UPDATE ... SET x = x + delta, never below 0: copies written
+    without signals (bulk_create, update(), imports) leave the counters
+    behind until rebuild_book_counters, and a decrement past 0 would fail
+    the PositiveIntegerField check.
+    """
+    if book_id is None:
+        return
+
+    def adjusted(counter):
+        return Greatest(F(counter) + delta, 0) if delta < 0 else F(counter) + delta
+
+    changes = {'copies_total': adjusted('copies_total')}
+    counter = BookInstance.STATUS_COUNTERS.get(status)
+    if counter:
+        changes[counter] = adjusted(counter)
+    Book.objects.using(using).filter(pk=book_id).update(**changes)
+
+
+def _saved_fields(update_fields):
+    fields = {'book', 'status'}
+    if update_fields is not None:
+        fields &= {'book' if name == 'book_id' else name for name in update_fields}
+    return fields
+
+
+@receiver(post_init, sender=BookInstance)
+def bookinstance_loaded(sender, instance, **kwargs):
+    instance._snapshot()
+
+
+@receiver(pre_save, sender=BookInstance)
+def bookinstance_saving(sender, instance, raw, using, update_fields, **kwargs):
+    """
+    Looks up the stored book and status if they were deferred when the
+    instance was loaded and this save is going to write them.
+    """
+    if instance._state.adding or DEFERRED not in instance._counted_state or not _saved_fields(update_fields):
+        return
+    instance._counted_state = (
+        BookInstance.objects.using(using).filter(pk=instance.pk).values_list('book_id', 'status').first()
+        or (None, None)
+    )
+
+
+def pages_changed(book_ids=(), author_ids=(), lists=()):
+    """
+    Marks the detail pages of these books and authors as changed: bumps
+    their last_modified (without sending signals) and their page cache tags,
+    along with the tags of the given list pages.
+    """
+    book_ids, author_ids = set(book_ids) - {None}, set(author_ids) - {None}
+    now = timezone.now()
+    if book_ids:
+        Book.objects.filter(pk__in=book_ids).update(last_modified=now)
+    if author_ids:
+        Author.objects.filter(pk__in=author_ids).update(last_modified=now)
+    invalidate_tags(*(f'book:{pk}' for pk in book_ids), *(f'author:{pk}' for pk in author_ids), *lists)
+
+
+def invalidate_book_pages(book_ids):
+    """
+    A copy changed: the detail pages of its book and of that book's author
+    show copies and copy counts.
+    """
+    book_ids = set(book_ids) - {None, DEFERRED}
+    if not book_ids:
+        return
+    author_ids = Book.objects.filter(pk__in=book_ids, author__isnull=False).values_list('author_id', flat=True)
+    pages_changed(book_ids, author_ids)
+
+
+@receiver(post_save, sender=BookInstance)
+def bookinstance_saved(sender, instance, created, using, update_fields, **kwargs):
+    """
+    Moves the copy between Book counters when it is created or its book or
+    status changed.
+    """
+    old_book_id, old_status = (None, None) if created else instance._counted_state
+    saved = {'book', 'status'} if created else _saved_fields(update_fields)
+    new_book_id = instance.book_id if 'book' in saved else old_book_id
+    new_status = instance.status if 'status' in saved else old_status
+    if (old_book_id, old_status) != (new_book_id, new_status):
+        adjust_copy_counters(old_book_id, old_status, -1, using)
+        adjust_copy_counters(new_book_id, new_status, 1, using)
+    invalidate_book_pages({old_book_id, new_book_id})
+    instance._counted_state = (new_book_id, new_status)
+
+
+@receiver(post_delete, sender=BookInstance)
+def bookinstance_deleted(sender, instance, using, **kwargs):
+    book_id, status = instance._counted_state
+    invalidate_book_pages({book_id})
+    if DEFERRED in (book_id, status):
+        # Deleted rows can't be read back any more; the counters drift until
+        # the next rebuild_book_counters run.
+        return
+    adjust_copy_counters(book_id, status, -1, using)
+
+
+@receiver(post_init, sender=Book)
+def book_loaded(sender, instance, **kwargs):
+    instance._loaded_author_id = instance.__dict__.get('author_id')
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def book_changed(sender, instance, **kwargs):
+    """
+    Reindexes the book, and marks its page, the book list and the pages of
+    its old and new author as changed.
+    """
+    index_books([instance.pk])
+    invalidate_tags(f'book:{instance.pk}')
+    pages_changed(author_ids={instance._loaded_author_id, instance.__dict__.get('author_id')}, lists=['books'])
+    instance._loaded_author_id = instance.__dict__.get('author_id')
+
+
+@receiver(m2m_changed, sender=Book.genre.through)
+def book_genres_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Genre names are part of a book's search entry and detail page.
+    """
+    if not reverse:
+        book_ids = [instance.pk]
+    elif action == 'pre_clear':
+        instance._indexed_book_ids = list(instance.book_set.values_list('pk', flat=True))
+        return
+    elif action == 'post_clear':
+        book_ids = instance._indexed_book_ids
+    else:
+        book_ids = pk_set
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        index_books(book_ids)
+        # The book list shows genre facet counts
+        pages_changed(book_ids, lists=['books'])
+
+
+@receiver(pre_delete, sender=Author)
+@receiver(pre_delete, sender=Genre)
+@receiver(pre_delete, sender=Language)
+def book_owner_deleting(sender, instance, **kwargs):
+    # The books are detached without signals, so remember them now
+    instance._indexed_book_ids = list(instance.book_set.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=Language)
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Genre)
+@receiver(post_delete, sender=Language)
+def book_owner_changed(sender, instance, **kwargs):
+    """
+    Author and genre names are part of the search entry and the detail page
+    of their books; author names also appear on the author pages and the
+    book list, genre and language names in the book list facets.
+    """
+    book_ids = getattr(instance, '_indexed_book_ids', None)
+    if book_ids is None:
+        book_ids = list(instance.book_set.values_list('pk', flat=True))
+    if sender is not Language:
+        index_books(book_ids)
+    if sender is Author:
+        invalidate_tags(f'author:{instance.pk}')
+        pages_changed(book_ids, lists=['authors', 'books'])
+    else:
+        pages_changed(book_ids, lists=['books'])
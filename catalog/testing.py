@@ -0,0 +1,59 @@
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+from contextlib import contextmanager
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def postgres_binary(name, bin_dir=None):
+    """
+    Path of a PostgreSQL server program (initdb, pg_ctl, createdb) in
+    bin_dir, $PG_BIN or the PATH, or None when it isn't installed.
+    """
+    bin_dir = bin_dir or os.environ.get('PG_BIN')
+    if bin_dir:
+        path = os.path.join(bin_dir, name)
+        return path if os.access(path, os.X_OK) else None
+    return shutil.which(name)
+
+
+@contextmanager
+def temporary_postgres(databases=(), bin_dir=None):
+    """
+    Runs a throwaway PostgreSQL server on a free local port for the
+    duration of the block, with the given databases created, and yields
+    its URL without a database name (postgres://postgres@127.0.0.1:<port>).
+
+    The cluster lives in a temporary directory with trust authentication
+    and fsync off; it is stopped and deleted on exit.
+    """
+    programs = {name: postgres_binary(name, bin_dir) for name in ('initdb', 'pg_ctl', 'createdb')}
+    missing = [name for name, path in programs.items() if path is None]
+    if missing:
+        raise FileNotFoundError(f'PostgreSQL programs not found: {", ".join(missing)} (set PG_BIN)')
+
+    data_dir = tempfile.mkdtemp(prefix='locallibrary-pg-')
+    port = _free_port()
+    quiet = {'stdout': subprocess.DEVNULL, 'stderr': subprocess.STDOUT, 'check': True}
+    try:
+        subprocess.run([programs['initdb'], '-D', data_dir, '-U', 'postgres', '--auth=trust', '-E', 'UTF8'], **quiet)
+        subprocess.run([
+            programs['pg_ctl'], '-D', data_dir, '-l', os.path.join(data_dir, 'server.log'), '-w',
+            '-o', f'-p {port} -k {data_dir} -c listen_addresses=127.0.0.1 -c fsync=off', 'start',
+        ], **quiet)
+        try:
+            for database in databases:
+                subprocess.run([programs['createdb'], '-h', '127.0.0.1', '-p', str(port), '-U', 'postgres',
+                                database], **quiet)
+            yield f'postgres://postgres@127.0.0.1:{port}'
+        finally:
+            subprocess.run([programs['pg_ctl'], '-D', data_dir, '-m', 'fast', '-w', 'stop'], **quiet)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
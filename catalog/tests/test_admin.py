@@ -0,0 +1,222 @@
+import datetime
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from catalog.admin import BookAdmin
+from catalog.counters import get_status_counts
+from catalog.loans import renew
+from catalog.models import Author, Book, BookInstance, Genre
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class ChangelistQueriesTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin', password='2HJ1vRV0Z&3iD')
+        cls.borrower = User.objects.create_user(username='borrower', password='1X<ISRUkw+tuK')
+        cls.genres = [Genre.objects.create(name=f'Genre {number}') for number in range(4)]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def _add_rows(self, number):
+        for _ in range(number):
+            count = Book.objects.count()
+            author = Author.objects.create(first_name='John', last_name=f'Smith {count}')
+            book = Book.objects.create(title=f'Book {count}', summary='Summary', isbn=str(count), author=author)
+            book.genre.set(self.genres)
+            BookInstance.objects.create(book=book, imprint='Imprint', status='o', borrower=self.borrower,
+                                        due_back=datetime.date.today())
+
+    def _queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def assertQueriesConstant(self, url):
+        self._add_rows(2)
+        _, few = self._queries(url)
+        self._add_rows(20)
+        response, many = self._queries(url)
+        self.assertEqual(len(response.context['cl'].result_list), 22)
+        self.assertEqual(few, many)
+        return response, many
+
+    def test_book_changelist(self):
+        response, queries = self.assertQueriesConstant(reverse('admin:catalog_book_changelist'))
+        # Session, user, count, rows with authors, genres
+        self.assertEqual(queries, 5)
+        self.assertContains(response, 'Genre 0,  Genre 1,  Genre 2<')
+
+    def test_author_changelist(self):
+        _, queries = self.assertQueriesConstant(reverse('admin:catalog_author_changelist'))
+        # Session, user, count, rows
+        self.assertEqual(queries, 4)
+
+    def test_bookinstance_changelist(self):
+        response, queries = self.assertQueriesConstant(reverse('admin:catalog_bookinstance_changelist'))
+        # Session, user, status counts, count, rows with books and borrowers
+        self.assertEqual(queries, 5)
+        self.assertContains(response, '>Book 21<')
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class PaginatedInlineTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin', password='2HJ1vRV0Z&3iD')
+        cls.author = Author.objects.create(first_name='John', last_name='Smith')
+        cls.book = Book.objects.create(title='Book Title', summary='Summary', isbn='1', author=cls.author)
+        cls.book.genre.add(Genre.objects.create(name='Fantasy'))
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:catalog_book_change', args=[self.book.pk])
+
+    def _add_copies(self, number):
+        BookInstance.objects.bulk_create(
+            BookInstance(book=self.book, imprint=f'Imprint {index}', status='a') for index in range(number))
+
+    def _copies_formset(self, response):
+        formset, = [inline.formset for inline in response.context['inline_admin_formsets']
+                    if inline.formset.model is BookInstance]
+        return formset
+
+    def _post_data(self, response):
+        """
+        The change form as rendered, ready to be posted back.
+        """
+        data = {}
+        forms = [response.context['adminform'].form]
+        for inline in response.context['inline_admin_formsets']:
+            data.update({field.html_name: field.value() for field in inline.formset.management_form})
+            forms.extend(inline.formset.forms)
+        for form in forms:
+            for field in form:
+                if field.value() is not None:
+                    data[field.html_name] = field.value()
+        return data
+
+    def test_renders_one_page(self):
+        self._add_copies(45)
+        response = self.client.get(self.url)
+        self.assertEqual(len(self._copies_formset(response).forms), 20)
+        self.assertContains(response, 'bookinstance_set-page=3')
+
+        response = self.client.get(self.url, {'bookinstance_set-page': 3})
+        self.assertEqual(len(self._copies_formset(response).forms), 5)
+
+    def test_queries_do_not_grow_with_copies(self):
+        # Untimed: the first request fills the content type cache
+        self.client.get(self.url)
+        counts = []
+        for number in (25, 500):
+            self._add_copies(number)
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(self.url)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_saves_the_page_posted(self):
+        self._add_copies(30)
+        response = self.client.get(self.url, {'bookinstance_set-page': 2})
+        data = self._post_data(response)
+        self.assertEqual(data['bookinstance_set-TOTAL_FORMS'], 10)
+        data['bookinstance_set-0-imprint'] = 'Second printing'
+
+        response = self.client.post(f'{self.url}?bookinstance_set-page=2', data)
+        self.assertRedirects(response, reverse('admin:catalog_book_changelist'), fetch_redirect_response=False)
+        self.assertEqual(BookInstance.objects.filter(imprint='Second printing').count(), 1)
+        self.assertEqual(BookInstance.objects.count(), 30)
+
+    def test_copy_changed_meanwhile_is_not_overwritten(self):
+        self._add_copies(1)
+        response = self.client.get(self.url)
+        data = self._post_data(response)
+        data['title'] = 'New title'
+        data['bookinstance_set-0-imprint'] = 'Second printing'
+        save_related = BookAdmin.save_related
+
+        def save_related_after_a_renewal(admin, *args):
+            # Written by someone else after the copies were read for this form
+            BookInstance.objects.update(imprint='Renewed meanwhile', version=F('version') + 1)
+            save_related(admin, *args)
+
+        with mock.patch.object(BookAdmin, 'save_related', save_related_after_a_renewal):
+            response = self.client.post(self.url, data, follow=True)
+        self.assertRedirects(response, self.url)
+        self.assertContains(response, 'nothing was saved')
+        # Rolled back as a whole (along with the stand-in write, in the same transaction here)
+        self.assertEqual(BookInstance.objects.get().imprint, 'Imprint 0')
+        self.assertEqual(Book.objects.get().title, 'Book Title')
+
+    def test_too_many_forms_are_rejected(self):
+        response = self.client.get(self.url)
+        data = self._post_data(response)
+        data['bookinstance_set-TOTAL_FORMS'] = 1000
+        response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(self._copies_formset(response).is_valid())
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class LoanStatusFilterTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin', password='2HJ1vRV0Z&3iD')
+        book = Book.objects.create(title='Book Title', summary='Summary', isbn='1')
+        today = datetime.date.today()
+        cls.overdue = BookInstance.objects.create(book=book, imprint='Imprint', status='o',
+                                                  due_back=today - datetime.timedelta(days=3))
+        cls.due = BookInstance.objects.create(book=book, imprint='Imprint', status='o', due_back=today)
+        # Due in the past, but no longer on loan
+        BookInstance.objects.create(book=book, imprint='Imprint', status='m', due_back=today - datetime.timedelta(days=3))
+        BookInstance.objects.create(book=book, imprint='Imprint', status='a')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:catalog_bookinstance_changelist')
+
+    def test_choices_show_counts(self):
+        response = self.client.get(self.url)
+        for choice in ('On loan (2)', 'Available (1)', 'Maintenance (1)', 'Reserved (0)', 'Overdue (1)'):
+            self.assertContains(response, choice)
+
+    def test_overdue_filter(self):
+        response = self.client.get(self.url, {'status': 'overdue'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.overdue])
+        response = self.client.get(self.url, {'status': 'o'})
+        self.assertEqual(len(response.context['cl'].result_list), 2)
+
+    def test_counts_are_one_query_then_cached(self):
+        with self.assertNumQueries(1):
+            counts = get_status_counts()
+        self.assertEqual(counts, {'o': 2, 'm': 1, 'a': 1, 'overdue': 1})
+        with self.assertNumQueries(0):
+            get_status_counts()
+        # Counted again on the next day, when other loans are overdue
+        with self.assertNumQueries(1):
+            counts = get_status_counts(datetime.date.today() + datetime.timedelta(days=1))
+        self.assertEqual(counts['overdue'], 2)
+
+    def test_writes_refresh_counts(self):
+        get_status_counts()
+        renew(self.overdue, datetime.date.today() + datetime.timedelta(weeks=1))
+        self.assertEqual(get_status_counts()['overdue'], 0)
+
+        self.due.status = 'a'
+        self.due.save()
+        self.assertEqual(get_status_counts()['a'], 2)
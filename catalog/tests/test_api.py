@@ -0,0 +1,106 @@
+import base64
+import datetime
+import json
+
+from django.test import TestCase
+from django.urls import reverse
+
+from catalog.models import Author, Book, BookInstance, Genre
+
+
+class ApiTestMixin:
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authors = [Author.objects.create(first_name=f'First{i}', last_name=f'Last{i}') for i in range(3)]
+        cls.genres = [Genre.objects.create(name=name) for name in ('Fantasy', 'Poetry')]
+        cls.books = []
+        for i in range(12):
+            book = Book.objects.create(title=f'Title {i:02d}', summary='Summary', isbn=f'{i:013d}',
+                                       author=cls.authors[i % 3])
+            book.genre.set(cls.genres[:i % 3])
+            cls.books.append(book)
+        cls.copy = BookInstance.objects.create(book=cls.books[0], imprint='Imprint', status='o',
+                                               due_back=datetime.date(2026, 11, 1))
+
+    def get_json(self, url, data=None, status=200):
+        response = self.client.get(url, data)
+        self.assertEqual(response.status_code, status, response.content)
+        return response.json()
+
+
+class ResourceListTest(ApiTestMixin, TestCase):
+
+    def test_fields_and_keyset_pages(self):
+        url = reverse('api-list', args=['books'])
+        titles = []
+        next_url = f'{url}?fields=title&page_size=5'
+        while next_url:
+            with self.assertNumQueries(1):
+                page = self.get_json(next_url)
+            self.assertTrue(all(set(row) == {'id', 'title'} for row in page['data']))
+            titles += [row['title'] for row in page['data']]
+            next_url = page['next']
+        self.assertEqual(titles, sorted(book.title for book in self.books))
+
+    def test_includes_take_one_query_each(self):
+        url = reverse('api-list', args=['books'])
+        with self.assertNumQueries(3):
+            page = self.get_json(url, {'fields': 'title', 'include': 'author,genre', 'page_size': 100})
+        self.assertEqual({row['id'] for row in page['included']['authors']}, {a.pk for a in self.authors})
+        self.assertEqual({row['name'] for row in page['included']['genres']}, {'Fantasy', 'Poetry'})
+        book = next(row for row in page['data'] if row['id'] == self.books[2].pk)
+        self.assertEqual(book['author'], self.authors[2].pk)
+        self.assertEqual(sorted(book['genre']), sorted(g.pk for g in self.genres))
+
+    def test_copies_hide_borrower(self):
+        page = self.get_json(reverse('api-list', args=['copies']), {'include': 'book'})
+        self.assertEqual(page['data'], [{
+            'id': str(self.copy.pk), 'book': self.books[0].pk, 'imprint': 'Imprint', 'status': 'o',
+            'due_back': '2026-11-01',
+        }])
+        self.assertEqual(page['included']['books'][0]['title'], 'Title 00')
+
+    def test_bad_requests(self):
+        url = reverse('api-list', args=['books'])
+        for params in ({'fields': 'borrower'}, {'include': 'copies'}, {'cursor': 'nonsense'}, {'page_size': 'x'}):
+            self.assertIn('error', self.get_json(url, params, status=400))
+        self.get_json(reverse('api-list', args=['users']), status=404)
+
+    def test_tampered_cursors(self):
+        for resource, values in (('books', ['x', 'abc', 1]), ('books', ['x', 1, 2 ** 70]), ('copies', ['notadate', 'zz'])):
+            cursor = base64.urlsafe_b64encode(json.dumps({'v': values, 'b': False}).encode()).decode()
+            self.assertIn('error', self.get_json(reverse('api-list', args=[resource]), {'cursor': cursor}, status=400))
+
+
+class ResourceBatchTest(ApiTestMixin, TestCase):
+
+    def test_ids_in_order_with_missing(self):
+        ids = [self.books[3].pk, 999999, self.books[1].pk]
+        with self.assertNumQueries(2):
+            batch = self.get_json(reverse('api-batch', args=['books']), {
+                'ids': ','.join(map(str, ids)), 'fields': 'title', 'include': 'author',
+            })
+        self.assertEqual([row['title'] for row in batch['data']], ['Title 03', 'Title 01'])
+        self.assertEqual(batch['missing'], [999999])
+        self.assertEqual(len(batch['included']['authors']), 2)
+
+    def test_invalid_ids(self):
+        for ids in ('abc', str(10 ** 22), '1.5.2'):
+            self.assertIn('error', self.get_json(reverse('api-batch', args=['books']), {'ids': ids}, status=400))
+        self.assertIn('error', self.get_json(reverse('api-batch', args=['copies']), {'ids': 'zz'}, status=400))
+
+    def test_post_of_many_ids(self):
+        ids = [str(self.copy.pk)] + [str(book.pk) for book in self.books]
+        response = self.client.post(reverse('api-batch', args=['copies']), json.dumps({'ids': ids[:1]}),
+                                    content_type='application/json')
+        self.assertEqual(response.json()['data'][0]['id'], str(self.copy.pk))
+
+        response = self.client.post(reverse('api-batch', args=['books']),
+                                    json.dumps({'ids': [book.pk for book in self.books]}),
+                                    content_type='application/json')
+        self.assertEqual(len(response.json()['data']), 12)
+
+        response = self.client.post(reverse('api-batch', args=['copies']), json.dumps({'ids': ['nope']}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,61 @@
+import threading
+
+from django.db import connection
+from django.test import SimpleTestCase
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    databases = {'default'}
+    size = 4
+
+    def setUp(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('PostgreSQL only (manage.py test_postgres)')
+        from catalog.backends.postgresql_pool.base import ConnectionPool
+
+        self.pool = ConnectionPool(1, self.size, 5, **connection.get_connection_params())
+        self.addCleanup(self.pool.closeall)
+
+    def _check_out_concurrently(self):
+        barrier = threading.Barrier(self.size)
+        connections = [None] * self.size
+
+        def check_out(index):
+            connections[index] = self.pool.getconn()
+            # Every thread holds its connection until all of them have one
+            barrier.wait()
+
+        threads = [threading.Thread(target=check_out, args=(index,)) for index in range(self.size)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return connections
+
+    def test_returned_connections_stay_open(self):
+        connections = self._check_out_concurrently()
+        self.assertEqual(len({id(conn) for conn in connections}), self.size)
+        for conn in connections:
+            self.pool.putconn(conn)
+        self.assertFalse(any(conn.closed for conn in connections))
+
+        # All of them are handed out again, none is opened anew
+        reused = self._check_out_concurrently()
+        self.assertEqual({id(conn) for conn in reused}, {id(conn) for conn in connections})
+        for conn in reused:
+            self.pool.putconn(conn)
+
+    def test_closed_connections_are_dropped(self):
+        conn = self.pool.getconn()
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        # Given back inside the transaction the SELECT began: rolled back and kept
+        self.pool.putconn(conn)
+        self.assertFalse(conn.closed)
+        self.assertIs(self.pool.getconn(), conn)
+
+        self.pool.putconn(conn, close=True)
+        self.assertTrue(conn.closed)
+        other = self.pool.getconn()
+        self.assertIsNot(other, conn)
+        self.pool.putconn(other)
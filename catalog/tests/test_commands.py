@@ -0,0 +1,235 @@
+import datetime
+import json
+import os
+import tempfile
+from importlib import import_module
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+
+from catalog.models import Author, Book, BookInstance, Genre
+from catalog.search import SearchResults
+
+
+class RebuildBookCountersCommandTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Book.objects.create(title='Counted', isbn='1')
+        BookInstance.objects.create(book=cls.book, status='a')
+        BookInstance.objects.create(book=cls.book, status='o')
+        Book.objects.create(title='No copies', isbn='2')
+
+    def test_no_drift(self):
+        out = StringIO()
+        call_command('rebuild_book_counters', stdout=out)
+        self.assertIn('Checked 2 books, 0 had drifted', out.getvalue())
+
+    def test_repairs_drift(self):
+        # update() bypasses the signals that keep the counters in step
+        BookInstance.objects.update(status='m')
+        out = StringIO()
+        call_command('rebuild_book_counters', '--dry-run', stdout=out)
+        self.assertIn('1 had drifted', out.getvalue())
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.copies_maintenance, 0)
+
+        call_command('rebuild_book_counters', '--batch-size=1', stdout=out)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.copies_total, 2)
+        self.assertEqual(self.book.copies_maintenance, 2)
+        self.assertEqual(self.book.copies_available, 0)
+
+
+class RebuildSearchIndexCommandTest(TestCase):
+
+    def setUp(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('The search index is SQLite FTS5 only')
+
+    def test_rebuild(self):
+        book = Book.objects.create(title='Roadside Picnic', isbn='1')
+        # update() bypasses the signals that keep the index current
+        Book.objects.update(title='Solaris')
+        self.assertEqual(SearchResults('solaris').count(), 0)
+
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Indexed 1 books.', out.getvalue())
+        self.assertEqual(SearchResults('solaris')[:10], [book])
+
+
+class ImportCatalogCommandTest(TestCase):
+
+    def _import(self, suffix, content, *args):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False, encoding='utf-8') as f:
+            f.write(content)
+        self.addCleanup(os.remove, f.name)
+        out = StringIO()
+        call_command('import_catalog', f.name, *args, stdout=out)
+        return out.getvalue()
+
+    def test_csv(self):
+        existing = Book.objects.create(title='Solaris', isbn='9780156027601')
+        BookInstance.objects.create(book=existing, status='a')
+        out = self._import('.csv', (
+            'isbn,title,summary,author_first_name,author_last_name,genres,copies,status\n'
+            '978-0575079786,Roadside Picnic,The Zone.,Arkady,Strugatsky,Science Fiction;Soviet,2,a\n'
+            '9780156027601,Solaris,,Stanislaw,Lem,Science Fiction,1,o\n'
+            '9785170906300,Monday Begins on Saturday,,Arkady,Strugatsky,Satire,1,\n'
+            ',No ISBN,,,,,1,a\n'
+        ), '--batch-size=2')
+        self.assertIn('Imported 2 new books and 4 copies from 4 rows (1 rows skipped).', out)
+
+        picnic = Book.objects.get(isbn='9780575079786')
+        self.assertEqual(str(picnic.author), 'Strugatsky, Arkady')
+        self.assertEqual(sorted(str(genre) for genre in picnic.genre.all()), ['Science Fiction', 'Soviet'])
+        self.assertEqual((picnic.copies_total, picnic.copies_available), (2, 2))
+        self.assertEqual(Author.objects.count(), 1)
+        self.assertEqual(Genre.objects.count(), 3)
+
+        existing.refresh_from_db()
+        self.assertEqual((existing.copies_total, existing.copies_on_loan), (2, 1))
+        self.assertIsNone(existing.author)
+
+        self.assertEqual(SearchResults('zone')[:10], [picnic])
+
+    def test_repeated_isbn(self):
+        first = Book.objects.create(title='Solaris', isbn='9780156027601')
+        Book.objects.create(title='Solaris (duplicate)', isbn='9780156027601')
+        out = self._import('.csv', (
+            'isbn,title,copies\n'
+            '978-0575079786,Roadside Picnic,1\n'
+            '9780575079786,Roadside Picnic,2\n'
+            '9780156027601,Solaris,1\n'
+        ))
+        self.assertIn('Imported 1 new books and 4 copies from 3 rows', out)
+        self.assertEqual(Book.objects.get(isbn='9780575079786').bookinstance_set.count(), 3)
+        self.assertEqual(list(BookInstance.objects.filter(book__isbn='9780156027601').values_list('book', flat=True)),
+                         [first.pk])
+
+    def test_jsonl(self):
+        out = self._import('.jsonl', json.dumps({
+            'isbn': '9780575079786',
+            'title': 'Roadside Picnic',
+            'author_first_name': 'Arkady',
+            'author_last_name': 'Strugatsky',
+            'genres': ['Science Fiction'],
+        }) + '\n')
+        self.assertIn('Imported 1 new books and 1 copies from 1 rows', out)
+        self.assertEqual(Book.objects.get().genre.get().name, 'Science Fiction')
+
+    def test_jsonl_malformed_line(self):
+        rows = [json.dumps({'isbn': isbn, 'title': 'Roadside Picnic'})
+                for isbn in ('9780575079786', '9785170906300', '9780156027601')]
+        content = '\n'.join([rows[0], '', rows[1], rows[2], '{"isbn": "9780156027601",']) + '\n'
+        message = ('Line 5 is not valid JSON: Expecting property name enclosed in double quotes. '
+                   'The 2 rows of the batches before it were imported; none of its batch or after it were.')
+        with self.assertRaisesMessage(CommandError, message):
+            self._import('.jsonl', content, '--batch-size=2')
+        self.assertEqual(sorted(Book.objects.values_list('isbn', flat=True)), ['9780575079786', '9785170906300'])
+
+        with self.assertRaisesMessage(CommandError, 'Line 1 is not a JSON object.'):
+            self._import('.jsonl', '["9780575079786"]\n')
+
+
+class ExportCatalogCommandTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for author_id in range(5):
+            Author.objects.create(first_name=f'First {author_id}', last_name=f'Last {author_id}')
+
+    def _export(self, *args):
+        out = StringIO()
+        call_command('export_catalog', 'authors', *args, stdout=out)
+        return out.getvalue().splitlines()
+
+    def test_jsonl(self):
+        lines = self._export('--format=jsonl', '--chunk-size=2')
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(json.loads(lines[4])['last_name'], 'Last 4')
+
+    def test_columns(self):
+        groups = [json.loads(line) for line in self._export('--format=columns', '--chunk-size=2')]
+        self.assertEqual([len(group['id']) for group in groups], [2, 2, 1])
+        self.assertEqual(groups[0]['first_name'], ['First 0', 'First 1'])
+
+
+class MigrateSessionsCommandTest(TestCase):
+
+    def setUp(self):
+        store = import_module(settings.SESSION_ENGINES['db']).SessionStore()
+        store['num_visits'] = 3
+        store.save()
+        self.session_key = store.session_key
+
+    def test_copies_into_cache_engines(self):
+        for engine in ('cache', 'cached_db'):
+            out = StringIO()
+            call_command('migrate_sessions', engine=engine, stdout=out)
+            self.assertIn('Copied 1 sessions', out.getvalue())
+            # Read from the cache alone: the session row is gone
+            Session.objects.all().delete()
+            store = import_module(settings.SESSION_ENGINES[engine]).SessionStore(session_key=self.session_key)
+            self.assertEqual(store['num_visits'], 3)
+            self.setUp()
+
+    def test_signed_cookies_cannot_be_filled_in(self):
+        with self.assertRaises(CommandError):
+            call_command('migrate_sessions', engine='signed_cookies', stdout=StringIO())
+
+
+class OverdueReportCommandTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        today = datetime.date(2026, 10, 17)
+        book = Book.objects.create(title='Late Book', isbn='1')
+        cls.readers = [
+            User.objects.create_user(username=f'reader{i}', email=f'reader{i}@example.com' if i else '')
+            for i in range(3)
+        ]
+        for reader in cls.readers:
+            for days in (-3, -1, 0, 5):
+                BookInstance.objects.create(book=book, status='o', borrower=reader,
+                                            due_back=today + datetime.timedelta(days=days))
+        # Overdue but not on loan any more
+        BookInstance.objects.create(book=book, status='a', borrower=cls.readers[1],
+                                    due_back=today - datetime.timedelta(days=10))
+
+    def test_one_digest_per_borrower(self):
+        out = StringIO()
+        call_command('overdue_report', '--date=2026-10-17', stdout=out)
+        self.assertIn('6 overdue loans of 3 borrowers; 2 digests sent, 1 borrowers without', out.getvalue())
+
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox),
+                         ['reader1@example.com', 'reader2@example.com'])
+        body = mail.outbox[0].body
+        self.assertEqual(body.count('Late Book'), 2)
+        self.assertIn('due 2026-10-14, 3 days late', body)
+
+    def test_no_mail(self):
+        out = StringIO()
+        call_command('overdue_report', '--date=2026-10-17', no_mail=True, stdout=out)
+        self.assertIn('reader0: 2 overdue, oldest due 2026-10-14', out.getvalue())
+        self.assertEqual(mail.outbox, [])
+
+    def test_query_count_does_not_grow_with_borrowers(self):
+        with self.assertNumQueries(1):
+            call_command('overdue_report', '--date=2026-10-17', stdout=StringIO())
+
+
+class TestPostgresCommandTest(TestCase):
+
+    def test_needs_postgres_programs(self):
+        with tempfile.TemporaryDirectory() as empty:
+            with self.assertRaisesMessage(CommandError, 'initdb, pg_ctl, createdb'):
+                call_command('test_postgres', f'--pg-bin={empty}')
@@ -1,10 +1,14 @@
-from django.test import TestCase
+import threading
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
 
 import datetime
 
 from django.urls import reverse
 from django.utils import timezone
 from catalog.forms import RenewBookForm
+from catalog.loans import renew
 from django.contrib.auth.models import User, Permission
 from catalog.models import Author, Book, Genre, BookInstance
 from catalog.views import AuthorCreate
@@ -192,6 +196,111 @@ class RenewBookInstanceViewTest(TestCase):
                              'Invalid date - renewal more than 4 weeks ahead')
 
 
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class RenewBookInstanceConflictTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.borrower = User.objects.create_user(username='borrower', password='1X<ISRUkw+tuK')
+        librarian = User.objects.create_user(username='librarian', password='2HJ1vRV0Z&3iD')
+        librarian.user_permissions.add(Permission.objects.get(codename='change_book'))
+        book = Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG')
+        cls.copy = BookInstance.objects.create(book=book, imprint='Imprint', status='o', borrower=cls.borrower,
+                                               due_back=datetime.date.today())
+
+    def setUp(self):
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+        self.url = reverse('renew-book-librarian', kwargs={'pk': self.copy.pk})
+
+    def test_renewal_writes_due_back_only(self):
+        version = self.client.get(self.url).context['form'].initial['version']
+        # Another librarian takes the copy back in the meantime, via a stale instance
+        BookInstance.objects.filter(pk=self.copy.pk).update(status='a', borrower=None)
+        due_back = datetime.date.today() + datetime.timedelta(weeks=2)
+        response = self.client.post(self.url, {'renewal_date': due_back})
+        self.assertRedirects(response, reverse('all-borrowed'), fetch_redirect_response=False)
+
+        copy = BookInstance.objects.get(pk=self.copy.pk)
+        self.assertEqual((copy.due_back, copy.status, copy.borrower), (due_back, 'a', None))
+        self.assertEqual(copy.version, version + 1)
+
+    def test_stale_form_is_an_error(self):
+        version = self.client.get(self.url).context['form'].initial['version']
+        copy = BookInstance.objects.get(pk=self.copy.pk)
+        copy.status = 'a'
+        copy.save()
+
+        response = self.client.post(self.url, {
+            'renewal_date': datetime.date.today() + datetime.timedelta(weeks=2), 'version': version,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].non_field_errors())
+        self.assertEqual(BookInstance.objects.get(pk=self.copy.pk).due_back, datetime.date.today())
+
+        # Submitting the form again renews on the current version
+        response = self.client.post(self.url, response.context['form'].data)
+        self.assertRedirects(response, reverse('all-borrowed'), fetch_redirect_response=False)
+
+
+class RenewalConcurrencyTest(TransactionTestCase):
+    threads = 8
+
+    def setUp(self):
+        book = Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG')
+        self.copy = BookInstance.objects.create(book=book, imprint='Imprint', status='o',
+                                                due_back=datetime.date.today())
+
+    def _in_parallel(self, *targets):
+        barrier = threading.Barrier(len(targets))
+        results = [None] * len(targets)
+
+        def run(index, target):
+            barrier.wait()
+            try:
+                results[index] = target()
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(index, target)) for index, target in enumerate(targets)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_one_renewal_wins_per_version(self):
+        version = self.copy.version
+        dates = [datetime.date.today() + datetime.timedelta(days=day) for day in range(1, self.threads + 1)]
+        results = self._in_parallel(*(
+            lambda due_back=due_back: renew(BookInstance.objects.get(pk=self.copy.pk), due_back, version)
+            for due_back in dates
+        ))
+
+        self.assertEqual(results.count(True), 1)
+        copy = BookInstance.objects.get(pk=self.copy.pk)
+        self.assertEqual(copy.due_back, dates[results.index(True)])
+        self.assertEqual(copy.version, version + 1)
+
+    def test_renewals_keep_concurrent_status_changes(self):
+        def take_back():
+            BookInstance.objects.filter(pk=self.copy.pk).update(status='a')
+            return True
+
+        version = self.copy.version
+        dates = [datetime.date.today() + datetime.timedelta(days=day) for day in range(1, self.threads)]
+        results = self._in_parallel(take_back, *(
+            lambda due_back=due_back: renew(BookInstance.objects.get(pk=self.copy.pk), due_back)
+            for due_back in dates
+        ))
+
+        # Without a version every renewal applies, and none undoes the status change
+        self.assertTrue(all(results))
+        copy = BookInstance.objects.get(pk=self.copy.pk)
+        self.assertEqual(copy.status, 'a')
+        self.assertIn(copy.due_back, dates)
+        self.assertEqual(copy.version, version + len(dates))
+
+
 class AuthorCreateTest(TestCase):
 
     def test_fields(self):
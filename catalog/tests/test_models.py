@@ -1,109 +1,115 @@
 from datetime import date
+from django.conf import settings
+from django.db import DatabaseError, connection
 from django.test import TestCase
 from catalog.models import Author, Book, Genre
-from catalog.models import BookInstance
+from catalog.models import BookInstance, StaleVersionError
+from catalog.uuids import uuid7
+from django.urls import resolve, reverse
+import time
 import uuid
+from unittest import mock
 
 
 class AuthorModelTest(TestCase):
 
     @classmethod
     def setUpTestData(cls):
-        Author.objects.create(first_name='Big', last_name='Bob')
+        cls.author = Author.objects.create(first_name='Big', last_name='Bob')
 
     def test_first_name_label(self):
-        author = Author.objects.get(id=1)
+        author = Author.objects.get(id=self.author.id)
         field_label = author._meta.get_field('first_name').verbose_name
         self.assertEquals(field_label, 'first name')
 
     def test_last_name_label(self):
-        author = Author.objects.get(id=1)
+        author = Author.objects.get(id=self.author.id)
         field_label = author._meta.get_field('last_name').verbose_name
         self.assertEquals(field_label, 'last name')
 
     def test_date_of_birth_label(self):
-        author = Author.objects.get(id=1)
+        author = Author.objects.get(id=self.author.id)
         field_label = author._meta.get_field('date_of_birth').verbose_name
         self.assertEquals(field_label, 'date of birth')
 
     def test_date_of_death_label(self):
-        author=Author.objects.get(id=1)
+        author=Author.objects.get(id=self.author.id)
         field_label = author._meta.get_field('date_of_death').verbose_name
         self.assertEquals(field_label, 'died')
 
     def test_first_name_max_length(self):
-        author = Author.objects.get(id=1)
+        author = Author.objects.get(id=self.author.id)
         max_length = author._meta.get_field('first_name').max_length
         self.assertEquals(max_length, 100)
 
     def test_last_name_max_length(self):
-        author = Author.objects.get(id=1)
+        author = Author.objects.get(id=self.author.id)
         max_length = author._meta.get_field('last_name').max_length
         self.assertEquals(max_length, 100)
 
     def test_objects_name_is_last_name_comma_first_name(self):
-        author = Author.objects.get(id=1)
+        author = Author.objects.get(id=self.author.id)
         expected_object_name = f'{author.last_name}, {author.first_name}'
         self.assertEquals(expected_object_name, str(author))
 
     def test_get_absolute_url(self):
-        author = Author.objects.get(id=1)
-        self.assertEquals(author.get_absolute_url(), '/catalog/author/1')
+        author = Author.objects.get(id=self.author.id)
+        self.assertEquals(author.get_absolute_url(), f'/catalog/author/{author.id}')
 
 
 class BookModelTest(TestCase):
 
     @classmethod
     def setUpTestData(cls):
-        Book.objects.create(title='Big Bang')
+        cls.book = Book.objects.create(title='Big Bang')
 
     def test_title_label(self):
-        book = Book.objects.get(id=1)
+        book = Book.objects.get(id=self.book.id)
         field_name = book._meta.get_field('title').verbose_name
         self.assertEquals(field_name, 'title')
 
     def test_author_label(self):
-        book = Book.objects.get(id=1)
+        book = Book.objects.get(id=self.book.id)
         field_name = book._meta.get_field('author').verbose_name
         self.assertEquals(field_name, 'author')
 
     def test_summary_label(self):
-        book = Book.objects.get(id=1)
+        book = Book.objects.get(id=self.book.id)
         field_name = book._meta.get_field('summary').verbose_name
         self.assertEquals(field_name, 'summary')
 
     def test_isbn_label(self):
-        book = Book.objects.get(id=1)
+        book = Book.objects.get(id=self.book.id)
         field_name = book._meta.get_field('isbn').verbose_name
         self.assertEquals(field_name, 'ISBN')
 
     def test_genre_label(self):
-        book = Book.objects.get(id=1)
+        book = Book.objects.get(id=self.book.id)
         field_name = book._meta.get_field('genre').verbose_name
         self.assertEquals(field_name, 'genre')
 
     def test_max_length_title_label(self):
-        book = Book.objects.get(id=1)
+        book = Book.objects.get(id=self.book.id)
         max_length = book._meta.get_field('title').max_length
         self.assertEquals(max_length, 200)
 
     def test_max_length_summary_label(self):
-        book = Book.objects.get(id=1)
+        book = Book.objects.get(id=self.book.id)
         max_length = book._meta.get_field('summary').max_length
         self.assertEquals(max_length, 1000)
 
 
     def test_max_length_isbn_label(self):
-        book = Book.objects.get(id=1)
+        book = Book.objects.get(id=self.book.id)
         max_length = book._meta.get_field('isbn').max_length
         self.assertEquals(max_length, 13)
 
     def test_absolute_url_label(self):
-        book = Book.objects.get(id=1)
-        self.assertEquals(book.get_absolute_url(), '/catalog/book/1')
+        book = Book.objects.get(id=self.book.id)
+        self.assertEquals(book.get_absolute_url(), f'/catalog/book/{book.id}')
 
     def test_str_label(self):
-        book = Book.objects.get(id=1)
+        book = Book.objects.get(id=self.book.id)
         expected_name = book.title
         self.assertEquals(expected_name, str(book))
 
@@ -112,20 +118,20 @@ class GenreModelTest(TestCase):
 
     @classmethod
     def setUpTestData(cls):
-        Genre.objects.create(name='Big Genre')
+        cls.genre = Genre.objects.create(name='Big Genre')
 
     def test_name_label(self):
-        genre = Genre.objects.get(id=1)
+        genre = Genre.objects.get(id=self.genre.id)
         field_name = genre._meta.get_field('name').verbose_name
         self.assertEquals(field_name, 'name')
 
     def test_max_length_name_label(self):
-        genre = Genre.objects.get(id=1)
+        genre = Genre.objects.get(id=self.genre.id)
         max_length = genre._meta.get_field('name').max_length
         self.assertEquals(max_length, 200)
 
     def _test_str_label(self):
-        genre = Genre.objects.get(id=1)
+        genre = Genre.objects.get(id=self.genre.id)
         expected_name = genre.name
         self.assertEquals(expected_name, str(genre))
 
@@ -203,3 +209,147 @@ class BookInstanceModelTest(TestCase):
 
 
 
+
+
+class BookCopyCountersTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Book.objects.create(title='Counted', isbn='1')
+        cls.other_book = Book.objects.create(title='Other', isbn='2')
+
+    def assertCounters(self, book, total, available=0, on_loan=0, reserved=0, maintenance=0):
+        book.refresh_from_db()
+        self.assertEqual(
+            (book.copies_total, book.copies_available, book.copies_on_loan,
+             book.copies_reserved, book.copies_maintenance),
+            (total, available, on_loan, reserved, maintenance),
+        )
+
+    def test_create_and_delete(self):
+        copy = BookInstance.objects.create(book=self.book, status='a')
+        BookInstance.objects.create(book=self.book, status='')
+        self.assertCounters(self.book, 2, available=1)
+        copy.delete()
+        self.assertCounters(self.book, 1)
+
+    def test_uncounted_copy_keeps_counters_at_zero(self):
+        # bulk_create sends no signals, so the counters never saw this copy
+        copy, = BookInstance.objects.bulk_create([BookInstance(book=self.book, status='a')])
+        self.assertCounters(self.book, 0)
+        copy = BookInstance.objects.get(pk=copy.pk)
+        copy.status = 'o'
+        copy.save()
+        self.assertCounters(self.book, 1, on_loan=1)
+        copy.delete()
+        self.assertCounters(self.book, 0)
+
+        copy, = BookInstance.objects.bulk_create([BookInstance(book=self.book, status='a')])
+        BookInstance.objects.get(pk=copy.pk).delete()
+        self.assertCounters(self.book, 0)
+
+    def test_status_change(self):
+        copy = BookInstance.objects.create(book=self.book, status='a')
+        copy.status = 'o'
+        copy.save()
+        self.assertCounters(self.book, 1, on_loan=1)
+        copy.save()
+        self.assertCounters(self.book, 1, on_loan=1)
+
+    def test_moved_to_other_book(self):
+        copy = BookInstance.objects.create(book=self.book, status='r')
+        copy.book = self.other_book
+        copy.save()
+        self.assertCounters(self.book, 0)
+        self.assertCounters(self.other_book, 1, reserved=1)
+
+    def test_save_of_deferred_instance(self):
+        BookInstance.objects.create(book=self.book, status='m')
+        copy = BookInstance.objects.only('id', 'imprint').get()
+        copy.imprint = 'New imprint'
+        copy.save()
+        self.assertCounters(self.book, 1, maintenance=1)
+
+        copy = BookInstance.objects.defer('status').get()
+        copy.status = 'a'
+        copy.save(update_fields=['status'])
+        self.assertCounters(self.book, 1, available=1)
+
+    def test_save_of_stale_book_keeps_counters(self):
+        book = Book.objects.get(pk=self.book.pk)
+        BookInstance.objects.create(book=self.book, status='a')
+        book.title = 'Renamed'
+        book.save()
+        self.assertCounters(self.book, 1, available=1)
+        self.assertEqual(Book.objects.get(pk=self.book.pk).title, 'Renamed')
+
+    def test_failed_save_keeps_version(self):
+        copy = BookInstance.objects.create(book=self.book, status='a')
+        copy.status = 'o'
+        with mock.patch('catalog.signals.adjust_copy_counters', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                copy.save()
+        self.assertEqual(copy.version, 1)
+        copy.save()
+        self.assertEqual(BookInstance.objects.get(pk=copy.pk).version, 2)
+        self.assertCounters(self.book, 1, on_loan=1)
+
+    def test_save_of_stale_instance(self):
+        copy = BookInstance.objects.create(book=self.book, status='a')
+        stale = BookInstance.objects.get(pk=copy.pk)
+        copy.status = 'o'
+        copy.save()
+
+        stale.status = 'm'
+        with self.assertRaises(StaleVersionError):
+            stale.save()
+        self.assertEqual(stale.version, 1)
+        self.assertEqual(BookInstance.objects.get(pk=copy.pk).status, 'o')
+        self.assertCounters(self.book, 1, on_loan=1)
+
+        stale.refresh_from_db()
+        stale.status = 'm'
+        stale.save()
+        self.assertEqual(BookInstance.objects.get(pk=copy.pk).version, 3)
+        self.assertCounters(self.book, 1, maintenance=1)
+
+
+class SQLitePragmasTest(TestCase):
+
+    def test_connection_is_configured(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite only')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout'])
+
+
+class CopyIdTest(TestCase):
+
+    def test_uuid7_is_time_ordered(self):
+        ids = [uuid7() for _ in range(3)]
+        for value in ids:
+            self.assertEqual(value.version, 7)
+            self.assertEqual(value.variant, uuid.RFC_4122)
+        time.sleep(0.002)
+        self.assertGreater(uuid7(), max(ids))
+
+    def test_default_generator(self):
+        self.assertEqual(BookInstance.objects.create(imprint='Imprint').pk.version, 7)
+        with self.settings(CATALOG_UUID_VERSION=4):
+            self.assertEqual(BookInstance.objects.create(imprint='Imprint').pk.version, 4)
+
+    def test_stored_in_16_bytes(self):
+        copy = BookInstance.objects.create(imprint='Imprint')
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT id FROM catalog_bookinstance')
+            stored = cursor.fetchone()[0]
+        if connection.vendor == 'sqlite':
+            self.assertEqual(stored, copy.pk.bytes)
+
+        self.assertEqual(BookInstance.objects.get(pk=str(copy.pk)), copy)
+        self.assertEqual(list(BookInstance.objects.filter(pk__in=[copy.pk]).values_list('pk', flat=True)), [copy.pk])
+        match = resolve(reverse('renew-book-librarian', args=[copy.pk]))
+        self.assertEqual(BookInstance.objects.get(pk=match.kwargs['pk']), copy)
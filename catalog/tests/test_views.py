@@ -1,13 +1,166 @@
-from django.test import TestCase
-
-from catalog.models import Author, Book, BookInstance, Book, Genre, #Language
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import cache
+from django.db import connection
+
+from catalog.models import Author, Book, BookInstance, Book, Genre, Language, SessionVisits
+from catalog import counters
+from catalog.facets import facet_counts
+from catalog.pagination import CursorPaginator
+from catalog.visits import visits
 from django.urls import reverse
 from django.utils import timezone
-from django.contrib.auth.models import User
+from django.contrib.auth.models import User, Permission
+from django.contrib.sessions.models import Session
+import base64
 import datetime
+import json
+from unittest import mock
+
+# Templates load {% static %}, which needs a collectstatic manifest under the
+# default storage; tests that render pages use the plain storage instead.
+PLAIN_STATIC = override_settings(
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage'
+)
+
+
+@PLAIN_STATIC
+class IndexViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        Genre.objects.create(name='Science Fiction')
+        Genre.objects.create(name='Poetry')
+        book = Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG', author=author)
+        for status in ('a', 'a', 'o'):
+            BookInstance.objects.create(book=book, imprint='Imprint', status=status)
 
+    def setUp(self):
+        cache.clear()
 
+    def _catalog_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('index'))
+        self.assertEqual(response.status_code, 200)
+        return response, [q for q in queries if 'catalog_' in q['sql']]
+
+    def test_counters(self):
+        response, _ = self._catalog_queries()
+        self.assertEqual(response.context['num_books'], 1)
+        self.assertEqual(response.context['num_instances'], 3)
+        self.assertEqual(response.context['num_instances_available'], 2)
+        self.assertEqual(response.context['num_authors'], 1)
+        self.assertEqual(response.context['num_genres'], 1)
+
+    def test_counters_use_one_query_then_cache(self):
+        _, cold = self._catalog_queries()
+        self.assertEqual(len(cold), 1)
+        _, warm = self._catalog_queries()
+        self.assertEqual(len(warm), 0)
+
+    def test_counters_refresh_after_write(self):
+        self._catalog_queries()
+        copy = BookInstance.objects.filter(status='o').get()
+        copy.status = 'a'
+        copy.save()
+        Author.objects.create(first_name='Jane', last_name='Doe')
+        response, _ = self._catalog_queries()
+        self.assertEqual(response.context['num_instances_available'], 3)
+        self.assertEqual(response.context['num_authors'], 2)
+
+    def test_counters_counted_before_a_write_are_not_kept(self):
+        compute_counters = counters.compute_counters
+
+        def compute_then_write():
+            # A write that lands while the snapshot is being counted
+            snapshot = compute_counters()
+            Author.objects.create(first_name='Jane', last_name='Doe')
+            return snapshot
+
+        with mock.patch.object(counters, 'compute_counters', compute_then_write):
+            self.assertEqual(counters.get_counters()['num_authors'], 1)
+        self.assertEqual(counters.get_counters()['num_authors'], 2)
+
+
+@PLAIN_STATIC
+class VisitCountTest(TestCase):
 
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user(username='reader', password='1X<ISRUkw+tuK')
+
+    def setUp(self):
+        visits.flush()
+        self.addCleanup(visits.flush)
+
+    def test_anonymous_visitor_gets_no_session(self):
+        for _ in range(2):
+            response = self.client.get(reverse('index'))
+            self.assertEqual(response.context['num_visits'], 1)
+        self.assertNotIn('sessionid', response.cookies)
+        self.assertFalse(Session.objects.exists())
+
+    def test_visits_are_counted_without_writes(self):
+        self.client.login(username='reader', password='1X<ISRUkw+tuK')
+        for number in (1, 2, 3):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('index'))
+            self.assertEqual(response.context['num_visits'], number)
+            self.assertFalse([q for q in queries if q['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))])
+
+        self.assertEqual(visits.flush(), 1)
+        session_key = self.client.session.session_key
+        self.assertEqual(SessionVisits.objects.get(session_key=session_key).visits, 3)
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response.context['num_visits'], 4)
+
+    @override_settings(CATALOG_VISITS_FLUSH_INTERVAL=0)
+    def test_flushes_are_bulk_upserts(self):
+        self.client.login(username='reader', password='1X<ISRUkw+tuK')
+        for _ in range(2):
+            self.client.get(reverse('index'))
+        self.assertEqual(SessionVisits.objects.get(session_key=self.client.session.session_key).visits, 2)
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_signed_cookie_sessions(self):
+        self.client.login(username='reader', password='1X<ISRUkw+tuK')
+        for number in (1, 2):
+            response = self.client.get(reverse('index'))
+            self.assertEqual(response.context['num_visits'], number)
+        self.assertEqual(visits.flush(), 1)
+
+    def test_flush_while_reading_the_stored_count(self):
+        SessionVisits.objects.create(session_key='session', visits=5, last_visit=timezone.now())
+        stored_count = visits._stored_count
+        other_hits = []
+
+        def read_then_flush(session_key):
+            count = stored_count(session_key)
+            if not other_hits:
+                # Another request of the session is counted and flushed before this one goes on
+                other_hits.append(None)
+                other_hits[0] = visits.hit(session_key)
+                visits.flush()
+            return count
+
+        with mock.patch.object(visits, '_stored_count', side_effect=read_then_flush):
+            self.assertEqual(visits.hit('session'), 7)
+        self.assertEqual(other_hits, [6])
+        self.assertEqual(visits.hit('session'), 8)
+        visits.flush()
+        self.assertEqual(SessionVisits.objects.get(session_key='session').visits, 8)
+
+    def test_count_of_existing_session_carries_over(self):
+        self.client.login(username='reader', password='1X<ISRUkw+tuK')
+        session = self.client.session
+        session['num_visits'] = 5
+        session.save()
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response.context['num_visits'], 5)
+
+
+@PLAIN_STATIC
 class AuthorListViewTest(TestCase):
 
     @classmethod
@@ -19,6 +172,10 @@ class AuthorListViewTest(TestCase):
                 last_name=f'Surname {author_id}'
             )
 
+    def setUp(self):
+        # Rendered pages are cached across tests, see catalog.pagecache
+        cache.clear()
+
     def test_view_url_exists_at_desired_location(self):
         response = self.client.get('/catalog/authors/')
         self.assertEqual(response.status_code, 200)
@@ -47,6 +204,594 @@ class AuthorListViewTest(TestCase):
         self.assertEqual(len(response.context['authors']), 3)
 
 
+@PLAIN_STATIC
+class BookDetailViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        cls.book = Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG', author=author)
+        cls.book.genre.set([Genre.objects.create(name='Fantasy'), Genre.objects.create(name='Poetry')])
+
+    def setUp(self):
+        # Rendered pages are cached across tests, see catalog.pagecache
+        cache.clear()
+
+    def _add_copies(self, number_of_copies):
+        for copy in range(number_of_copies):
+            BookInstance.objects.create(book=self.book, imprint='Imprint', status='aom'[copy % 3])
+
+    def test_query_budget_does_not_grow_with_copies(self):
+        # version (conditional GET), book + author (joined), genres, copies
+        for number_of_copies in (1, 50):
+            self._add_copies(number_of_copies)
+            with self.assertNumQueries(4):
+                response = self.client.get(self.book.get_absolute_url())
+            self.assertEqual(response.status_code, 200)
+
+    def test_renders_genres_and_copies(self):
+        self._add_copies(3)
+        response = self.client.get(self.book.get_absolute_url())
+        self.assertContains(response, 'Fantasy, Poetry')
+        self.assertContains(response, 'On loan')
+        self.assertContains(response, 'Maintenance')
+
+
+@PLAIN_STATIC
+class AuthorDetailViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='John', last_name='Smith')
+
+    def setUp(self):
+        # Rendered pages are cached across tests, see catalog.pagecache
+        cache.clear()
+
+    def _add_books(self, number_of_books):
+        for book_id in range(number_of_books):
+            book = Book.objects.create(title=f'Book {book_id}', summary='Summary', isbn='ABCDEFG', author=self.author)
+            BookInstance.objects.create(book=book, imprint='Imprint', status='a')
+            BookInstance.objects.create(book=book, imprint='Imprint', status='o')
+
+    def test_query_budget_does_not_grow_with_books(self):
+        # version (conditional GET), author, books (copy counts are columns of Book)
+        for number_of_books in (1, 20):
+            self._add_books(number_of_books)
+            with self.assertNumQueries(3):
+                response = self.client.get(self.author.get_absolute_url())
+            self.assertEqual(response.status_code, 200)
+
+    def test_books_show_copy_counts(self):
+        self._add_books(2)
+        response = self.client.get(self.author.get_absolute_url())
+        for book in response.context['books']:
+            self.assertEqual(book.copies_total, 2)
+            self.assertEqual(book.copies_available, 1)
+        self.assertContains(response, '(1/2)', count=2)
+
+
+@PLAIN_STATIC
+class PageCacheTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.librarian = User.objects.create_user(username='librarian', password='2HJ1vRV0Z&3iD')
+        cls.librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        cls.author = Author.objects.create(first_name='John', last_name='Smith')
+        cls.book = Book.objects.create(title='Book Title', summary='Summary', isbn='1', author=cls.author)
+        cls.other_book = Book.objects.create(title='Other Title', summary='Summary', isbn='2', author=cls.author)
+        cls.copy = BookInstance.objects.create(book=cls.book, imprint='Imprint', status='a')
+
+    def setUp(self):
+        cache.clear()
+
+    def assertCached(self, url):
+        # Only the conditional GET version lookup
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_pages_are_cached(self):
+        for url in (reverse('books'), reverse('authors'), self.book.get_absolute_url(),
+                    self.author.get_absolute_url(), reverse('books') + '?page=1'):
+            first = self.client.get(url)
+            self.assertEqual(self.assertCached(url).content, first.content)
+
+    def test_write_invalidates_only_affected_pages(self):
+        for url in (self.book.get_absolute_url(), self.other_book.get_absolute_url(),
+                    self.author.get_absolute_url(), reverse('books'), reverse('authors')):
+            self.client.get(url)
+
+        self.copy.status = 'o'
+        self.copy.save()
+
+        response = self.client.get(self.book.get_absolute_url())
+        self.assertContains(response, 'On loan')
+        self.assertContains(self.client.get(self.author.get_absolute_url()), '(0/1)')
+        self.assertCached(self.other_book.get_absolute_url())
+        self.assertCached(reverse('books'))
+        self.assertCached(reverse('authors'))
+
+        self.author.last_name = 'Smythe'
+        self.author.save()
+        self.assertContains(self.client.get(reverse('books')), 'Smythe')
+        self.assertContains(self.client.get(self.other_book.get_absolute_url()), 'Smythe')
+
+    def test_keyed_by_permissions(self):
+        anonymous = self.client.get(self.book.get_absolute_url())
+        self.assertNotContains(anonymous, 'Update the book')
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+        response = self.client.get(self.book.get_absolute_url())
+        self.assertContains(response, 'Update the book')
+        self.assertContains(response, 'User: librarian')
+
+
+@PLAIN_STATIC
+class ConditionalGetTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='John', last_name='Smith')
+        cls.book = Book.objects.create(title='Book Title', summary='Summary', isbn='1', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def _revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_not_modified_after_one_query(self):
+        for url in (self.book.get_absolute_url(), self.author.get_absolute_url(),
+                    reverse('books'), reverse('authors')):
+            response = self.client.get(url)
+            self.assertIn('Last-Modified', response)
+            with self.assertNumQueries(1):
+                revalidated = self._revalidate(url, response)
+            self.assertEqual(revalidated.status_code, 304)
+
+            revalidated = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            self.assertEqual(revalidated.status_code, 304)
+
+    def test_related_writes_change_the_version(self):
+        book_page = self.client.get(self.book.get_absolute_url())
+        author_page = self.client.get(self.author.get_absolute_url())
+        BookInstance.objects.create(book=self.book, imprint='Imprint', status='a')
+        self.assertEqual(self._revalidate(self.book.get_absolute_url(), book_page).status_code, 200)
+        self.assertEqual(self._revalidate(self.author.get_absolute_url(), author_page).status_code, 200)
+
+        book_page = self.client.get(self.book.get_absolute_url())
+        self.author.first_name = 'Jon'
+        self.author.save()
+        self.assertEqual(self._revalidate(self.book.get_absolute_url(), book_page).status_code, 200)
+
+        book_page = self.client.get(self.book.get_absolute_url())
+        self.book.genre.add(Genre.objects.create(name='Poetry'))
+        self.assertEqual(self._revalidate(self.book.get_absolute_url(), book_page).status_code, 200)
+
+    def test_deletion_changes_list_version(self):
+        other = Book.objects.create(title='Other', summary='Summary', isbn='2')
+        list_page = self.client.get(reverse('books'))
+        other.delete()
+        self.assertEqual(self._revalidate(reverse('books'), list_page).status_code, 200)
+
+    def test_etag_depends_on_viewer(self):
+        anonymous = self.client.get(self.book.get_absolute_url())
+        User.objects.create_user(username='reader', password='1X<ISRUkw+tuK')
+        self.client.login(username='reader', password='1X<ISRUkw+tuK')
+        self.assertEqual(self._revalidate(self.book.get_absolute_url(), anonymous).status_code, 200)
+
+
+@PLAIN_STATIC
+class SidebarFragmentTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.librarian = User.objects.create_user(username='librarian', password='2HJ1vRV0Z&3iD')
+        cls.librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        cls.reader = User.objects.create_user(username='reader', password='1X<ISRUkw+tuK')
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(visits.flush)
+
+    def test_fragment_is_shared_per_viewer_kind_only(self):
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, reverse('login'))
+        self.assertNotContains(response, 'Logout')
+
+        self.client.login(username='reader', password='1X<ISRUkw+tuK')
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'User: reader')
+        self.assertNotContains(response, reverse('all-borrowed'))
+
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'User: librarian')
+        self.assertContains(response, reverse('all-borrowed'))
+        self.assertNotContains(response, reverse('login'))
+
+    def test_logout_link_follows_the_page(self):
+        self.client.login(username='reader', password='1X<ISRUkw+tuK')
+        for url in (reverse('index'), reverse('my-borrowed')):
+            response = self.client.get(url)
+            self.assertContains(response, f'{reverse("logout")}?next={url}')
+
+
+@PLAIN_STATIC
+class LibrarianListViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.librarian = User.objects.create_user(username='librarian', password='2HJ1vRV0Z&3iD')
+        cls.librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        cls.borrower = User.objects.create_user(username='borrower', password='1X<ISRUkw+tuK')
+        cls.book = Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG')
+
+    def _lend_copies(self, number_of_copies):
+        for copy in range(number_of_copies):
+            BookInstance.objects.create(
+                book=self.book,
+                imprint='Imprint',
+                due_back=datetime.date.today() + datetime.timedelta(days=copy),
+                borrower=self.borrower,
+                status='o',
+            )
+
+    def test_query_budget_does_not_grow_with_rows(self):
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+        # session, user, permissions (user + group), count, page
+        for number_of_copies in (1, 9):
+            self._lend_copies(number_of_copies)
+            with self.assertNumQueries(6):
+                response = self.client.get(reverse('all-borrowed'))
+            self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'borrower', count=10)
+
+    def test_my_borrowed_query_budget_does_not_grow_with_rows(self):
+        self.client.login(username='borrower', password='1X<ISRUkw+tuK')
+        # session, user, permissions (user + group), count, page
+        for number_of_copies in (1, 9):
+            self._lend_copies(number_of_copies)
+            with self.assertNumQueries(6):
+                response = self.client.get(reverse('my-borrowed'))
+            self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Book Title', count=10)
+
+    def test_overdue_only(self):
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+        # Due today, tomorrow, ...; move the first three into the past
+        self._lend_copies(15)
+        for days, copy in enumerate(BookInstance.objects.order_by('due_back')[:3], start=1):
+            BookInstance.objects.filter(pk=copy.pk).update(due_back=datetime.date.today() - datetime.timedelta(days=days))
+
+        response = self.client.get(reverse('all-borrowed'), {'overdue_only': 1})
+        self.assertEqual(len(response.context['bookinstance_list']), 3)
+        self.assertTrue(all(copy.is_overdue for copy in response.context['bookinstance_list']))
+        self.assertFalse(response.context['is_paginated'])
+
+        # Page links keep the filter
+        BookInstance.objects.filter(due_back__gte=datetime.date.today()).update(
+            due_back=datetime.date.today() - datetime.timedelta(days=30))
+        response = self.client.get(reverse('all-borrowed'), {'overdue_only': 1})
+        self.assertContains(response, '?overdue_only=1&page=2')
+
+
+@PLAIN_STATIC
+class BulkLoanTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.librarian = User.objects.create_user(username='librarian', password='2HJ1vRV0Z&3iD', is_staff=True)
+        cls.librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'),
+                                           Permission.objects.get(codename='change_bookinstance'))
+        cls.borrower = User.objects.create_user(username='borrower', password='1X<ISRUkw+tuK')
+        cls.book = Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG')
+
+    def setUp(self):
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+
+    def _lend_copies(self, number_of_copies):
+        return [
+            BookInstance.objects.create(book=self.book, imprint='Imprint', status='o', borrower=self.borrower,
+                                        due_back=datetime.date.today()).pk
+            for _ in range(number_of_copies)
+        ]
+
+    def _counters(self):
+        return Book.objects.filter(pk=self.book.pk).values(
+            'copies_total', 'copies_available', 'copies_on_loan', 'copies_reserved', 'copies_maintenance').get()
+
+    def test_renew_selected(self):
+        copies = self._lend_copies(3)
+        returned = BookInstance.objects.create(book=self.book, imprint='Imprint', status='a')
+        due_back = datetime.date.today() + datetime.timedelta(weeks=2)
+        response = self.client.post(reverse('all-borrowed'), {
+            'action': 'renew', 'renewal_date': due_back, 'copies': copies[:2] + [returned.pk],
+        })
+        self.assertRedirects(response, reverse('all-borrowed'))
+        self.assertEqual(BookInstance.objects.filter(due_back=due_back).count(), 2)
+        self.assertIsNone(BookInstance.objects.get(pk=returned.pk).due_back)
+
+    def test_renewal_date_is_validated(self):
+        copies = self._lend_copies(2)
+        for renewal_date in ('', datetime.date.today() + datetime.timedelta(weeks=5)):
+            response = self.client.post(reverse('all-borrowed'), {
+                'action': 'renew', 'renewal_date': renewal_date, 'copies': copies,
+            })
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.context['bulk_form'].errors['renewal_date'])
+        self.assertFalse(BookInstance.objects.exclude(due_back=datetime.date.today()).exists())
+
+    def test_return_selected_keeps_counters(self):
+        copies = self._lend_copies(3)
+        copy = BookInstance.objects.get(pk=copies[0])
+        copy.status = 'r'
+        copy.save()
+
+        response = self.client.post(reverse('all-borrowed'), {'action': 'return', 'copies': copies[:2]})
+        self.assertRedirects(response, reverse('all-borrowed'))
+        self.assertEqual(BookInstance.objects.filter(status='a', borrower=None, due_back=None).count(), 2)
+        self.assertEqual(self._counters(), {
+            'copies_total': 3, 'copies_available': 2, 'copies_on_loan': 1, 'copies_reserved': 0,
+            'copies_maintenance': 0,
+        })
+
+    def test_queries_do_not_grow_with_selection(self):
+        counts = []
+        for number_of_copies in (2, 20):
+            copies = self._lend_copies(number_of_copies)
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post(reverse('all-borrowed'), {'action': 'return', 'copies': copies})
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_admin_actions(self):
+        copies = self._lend_copies(2)
+        changelist = reverse('admin:catalog_bookinstance_changelist')
+        due_back = datetime.date.today() + datetime.timedelta(weeks=1)
+        response = self.client.post(changelist, {'action': 'renew_selected', '_selected_action': copies})
+        self.assertContains(response, 'Renew the 2 selected copies')
+        response = self.client.post(changelist, {
+            'action': 'renew_selected', '_selected_action': copies, 'apply': 'Renew', 'renewal_date': due_back,
+        })
+        self.assertRedirects(response, changelist, fetch_redirect_response=False)
+        self.assertEqual(BookInstance.objects.filter(due_back=due_back).count(), 2)
+
+        response = self.client.post(changelist, {'action': 'return_selected', '_selected_action': copies})
+        self.assertRedirects(response, changelist, fetch_redirect_response=False)
+        self.assertEqual(BookInstance.objects.filter(status='a').count(), 2)
+        self.assertEqual(self._counters()['copies_available'], 2)
+
+@PLAIN_STATIC
+@override_settings(CATALOG_CURSOR_PAGINATION=True)
+class CursorPaginationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Duplicate surnames so the primary key has to break ties
+        for author_id in range(13):
+            Author.objects.create(first_name=f'Christian {author_id}', last_name=f'Surname {author_id % 4}')
+        book = Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG')
+        for copy in range(7):
+            due_back = None if copy % 3 == 0 else datetime.date.today() + datetime.timedelta(days=copy % 2)
+            BookInstance.objects.create(book=book, imprint='Imprint', due_back=due_back, status='o')
+
+    def setUp(self):
+        # Rendered pages are cached across tests, see catalog.pagecache
+        cache.clear()
+
+    def _walk(self, paginator):
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        return pages
+
+    def test_author_pages_without_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('authors'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any('COUNT(' in q['sql'] for q in queries))
+        self.assertTrue(response.context['is_paginated'])
+        self.assertEqual(len(response.context['authors']), 10)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+        next_cursor = response.context['page_obj'].next_cursor
+        self.assertContains(response, f'?cursor={next_cursor}')
+        response = self.client.get(reverse('authors') + f'?cursor={next_cursor}')
+        self.assertEqual(len(response.context['authors']), 3)
+        self.assertFalse(response.context['page_obj'].has_next())
+        self.assertTrue(response.context['page_obj'].has_previous())
+
+    def test_walk_forwards_and_backwards(self):
+        for queryset in (Author.objects.all(), BookInstance.objects.all()):
+            paginator = CursorPaginator(queryset, 3)
+            pages = self._walk(paginator)
+            seen = [obj.pk for page in pages for obj in page]
+            self.assertEqual(len(seen), queryset.count())
+            self.assertEqual(len(set(seen)), len(seen))
+
+            page = pages[-1]
+            for expected in reversed(pages[:-1]):
+                page = paginator.page(page.previous_cursor)
+                self.assertEqual([obj.pk for obj in page], [obj.pk for obj in expected])
+            self.assertFalse(page.has_previous())
+
+    def test_pages_follow_default_ordering(self):
+        # Same titles, authors created in the reverse order of their names
+        for last_name in ('Zola', 'Austen'):
+            author = Author.objects.create(first_name='First', last_name=last_name)
+            Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG', author=author)
+        for queryset in (Author.objects.all(), Book.objects.all()):
+            pages = self._walk(CursorPaginator(queryset, 2))
+            self.assertEqual([obj.pk for page in pages for obj in page], [obj.pk for obj in queryset])
+
+    def test_invalid_cursor_is_404(self):
+        response = self.client.get(reverse('authors') + '?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+    def test_tampered_cursor_is_404(self):
+        # Well formed, but with values the ordering fields can't take
+        for url, values in ((reverse('books'), ['x', 'abc', 1]), (reverse('authors'), ['a', 'b', 2 ** 70])):
+            cursor = base64.urlsafe_b64encode(json.dumps({'v': values, 'b': False}).encode()).decode()
+            response = self.client.get(url, {'cursor': cursor})
+            self.assertEqual(response.status_code, 404)
+
+
+@PLAIN_STATIC
+class FacetTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        cls.english = Language.objects.create(name='English')
+        cls.french = Language.objects.create(name='French')
+        cls.fantasy = Genre.objects.create(name='Fantasy')
+        cls.poetry = Genre.objects.create(name='Poetry')
+        cls.books = []
+        for number in range(8):
+            book = Book.objects.create(title=f'Book {number}', summary='Summary', isbn=str(number), author=author,
+                                       language=cls.english if number % 2 else cls.french)
+            book.genre.add(cls.fantasy if number < 6 else cls.poetry)
+            cls.books.append(book)
+
+    def setUp(self):
+        cache.clear()
+
+    def _counts(self, response):
+        return {facet['name']: {choice['name']: choice['books'] for choice in facet['choices']}
+                for facet in response.context['facets']}
+
+    def test_filters_and_counts(self):
+        response = self.client.get(reverse('books'), {'language': self.english.pk, 'genre': self.fantasy.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['paginator'].count, 3)
+        self.assertTrue(all(book.language == self.english for book in response.context['book_list']))
+        # Each facet is counted under the picks of the other one only
+        self.assertEqual(self._counts(response), {
+            'language': {'English': 3, 'French': 3},
+            'genre': {'Fantasy': 3, 'Poetry': 1},
+        })
+
+        response = self.client.get(reverse('books'), {'genre': [self.fantasy.pk, self.poetry.pk]})
+        self.assertEqual(response.context['paginator'].count, 8)
+
+    def test_counts_are_one_query_then_cached(self):
+        selected = {'language': [self.french.pk], 'genre': []}
+        with self.assertNumQueries(1):
+            facet_counts(selected)
+        with self.assertNumQueries(0):
+            facet_counts(selected)
+
+    def test_writes_refresh_counts(self):
+        url = reverse('books')
+        self.assertEqual(self._counts(self.client.get(url))['genre'], {'Fantasy': 6, 'Poetry': 2})
+
+        self.books[0].genre.add(self.poetry)
+        self.assertEqual(self._counts(self.client.get(url))['genre'], {'Fantasy': 6, 'Poetry': 3})
+
+        self.french.name = 'Francais'
+        self.french.save()
+        self.assertEqual(self._counts(self.client.get(url))['language'], {'English': 4, 'Francais': 4})
+
+    def test_page_links_keep_the_filters(self):
+        response = self.client.get(reverse('books'), {'genre': self.fantasy.pk})
+        self.assertContains(response, f'?genre={self.fantasy.pk}&page=2')
+        self.assertContains(response, 'Clear filters')
+
+        response = self.client.get(reverse('books'), {'genre': self.poetry.pk, 'language': self.english.pk})
+        self.assertEqual(response.context['paginator'].count, 1)
+
+
+@PLAIN_STATIC
+class BookSearchViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        strugatsky = Author.objects.create(first_name='Arkady', last_name='Strugatsky')
+        lem = Author.objects.create(first_name='Stanislaw', last_name='Lem')
+        cls.picnic = Book.objects.create(title='Roadside Picnic', summary='The Zone.', isbn='9780575079786',
+                                         author=strugatsky)
+        cls.solaris = Book.objects.create(title='Solaris', summary='A picnic is mentioned once.', isbn='9780156027601',
+                                          author=lem)
+        cls.picnic.genre.add(Genre.objects.create(name='Science Fiction'))
+
+    def _search(self, query):
+        response = self.client.get(reverse('search'), {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return list(response.context['book_list'])
+
+    def test_ranks_title_above_summary(self):
+        self.assertEqual(self._search('picnic'), [self.picnic, self.solaris])
+
+    def test_matches_author_genre_isbn_and_prefix(self):
+        self.assertEqual(self._search('lem'), [self.solaris])
+        self.assertEqual(self._search('science fiction'), [self.picnic])
+        self.assertEqual(self._search('9780156027601'), [self.solaris])
+        self.assertEqual(self._search('Strug'), [self.picnic])
+
+    def test_index_follows_writes(self):
+        self.solaris.title = 'Eden'
+        self.solaris.save()
+        self.assertEqual(self._search('solaris'), [])
+        self.assertEqual(self._search('eden'), [self.solaris])
+
+        self.solaris.author.last_name = 'Lemm'
+        self.solaris.author.save()
+        self.assertEqual(self._search('lemm'), [self.solaris])
+
+        self.solaris.genre.add(Genre.objects.create(name='Satire'))
+        self.assertEqual(self._search('satire'), [self.solaris])
+        Genre.objects.get(name='Satire').delete()
+        self.assertEqual(self._search('satire'), [])
+
+        self.picnic.delete()
+        self.assertEqual(self._search('picnic'), [self.solaris])
+
+    def test_operators_are_literal(self):
+        self.assertEqual(self._search('"picnic OR ('), [])
+        self.assertEqual(self._search(''), [])
+
+
+class ExportViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user(username='reader', password='1X<ISRUkw+tuK')
+        librarian = User.objects.create_user(username='librarian', password='2HJ1vRV0Z&3iD')
+        librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        author = Author.objects.create(first_name='Arkady', last_name='Strugatsky')
+        genres = [Genre.objects.create(name='Science Fiction'), Genre.objects.create(name='Satire')]
+        for book_id in range(5):
+            book = Book.objects.create(title=f'Book {book_id}', summary='Summary', isbn=str(book_id), author=author)
+            book.genre.set(genres)
+
+    def test_requires_permission(self):
+        response = self.client.get(reverse('export', args=['books']))
+        self.assertEqual(response.status_code, 302)
+        self.client.login(username='reader', password='1X<ISRUkw+tuK')
+        response = self.client.get(reverse('export', args=['books']))
+        self.assertEqual(response.status_code, 403)
+
+    def test_streams_books_with_flattened_genres(self):
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+        response = self.client.get(reverse('export', args=['books']))
+        self.assertTrue(response.streaming)
+        # books chunk, genres of the chunk
+        with self.assertNumQueries(2):
+            lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 6)
+        self.assertTrue(lines[0].startswith('id,isbn,title,'))
+        self.assertIn('Strugatsky,Satire; Science Fiction,0,0', lines[1])
+
+    def test_unknown_resource_or_format(self):
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+        self.assertEqual(self.client.get(reverse('export', args=['users'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('export', args=['books']), {'format': 'xml'}).status_code, 404)
+
+
+@PLAIN_STATIC
 class LoanedBookInstancesByUserListViewTest(TestCase):
     def setUp(self):
         # Create two users
@@ -58,14 +803,14 @@ class LoanedBookInstancesByUserListViewTest(TestCase):
 
         # Create a book
         test_author = Author.objects.create(first_name='John', last_name='Smith')
-        test_genre = Genre.onjects.create(name='Fantasy')
-        # test_language = Language.objects.create(name='English')
+        test_genre = Genre.objects.create(name='Fantasy')
+        test_language = Language.objects.create(name='English')
         test_book = Book.objects.create(
             title='Book Title',
             summary="You don't need any summary",
             isbn ='ADCDEFG',
             author=test_author,
-            # language=test_language,
+            language=test_language,
         )
 
         # Create genre as a post_step
@@ -91,7 +836,7 @@ class LoanedBookInstancesByUserListViewTest(TestCase):
 
     def test_redirect_if_not_logged_in(self):
         response = self.client.get(reverse('my-borrowed'))
-        self.assertRedirects(response, '/accounts/login/?/next=/catalog/mybooks/')
+        self.assertRedirects(response, '/accounts/login/?next=/catalog/mybooks/')
 
     def test_logged_in_uses_correct_template(self):
         login = self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
@@ -160,7 +905,7 @@ class LoanedBookInstancesByUserListViewTest(TestCase):
 
         # Why is it needed?
         last_date = 0
-        for book in response.conteext['bookinstance_list']:
+        for book in response.context['bookinstance_list']:
             if last_date == 0:
                 last_date = book.due_back
             else:
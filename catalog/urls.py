@@ -1,14 +1,18 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.index, name='index'),
     path('books/', views.BookListView.as_view(), name='books'),
     path('book/<int:pk>', views.BookDetailView.as_view(), name='book-detail'),
+    path('search/', views.BookSearchView.as_view(), name='search'),
     path('authors/', views.AuthorListView.as_view(), name='authors'),
     path('author/<int:pk>', views.AuthorDetailView.as_view(), name='author-detail'),
     path('mybooks/', views.LoanedBookByUserListView.as_view(), name='my-borrowed'),
     path('allborrowed/', views.Librarian.as_view(), name='all-borrowed'),
+    path('export/<str:resource>/', views.export_catalog, name='export'),
+    path('api/<str:resource>/', api.resource_list, name='api-list'),
+    path('api/<str:resource>/batch/', api.resource_batch, name='api-batch'),
     path('book/<uuid:pk>/renew/', views.renew_book_librarian, name='renew-book-librarian'),
     path('author/create/', views.AuthorCreate.as_view(), name='author-create'),
     path('author/<int:pk>/update/', views.AuthorUpdate.as_view(), name='author-update'),
@@ -0,0 +1,63 @@
+import os
+import time
+import uuid
+
+from django.conf import settings
+from django.db import models
+
+
+def uuid7():
+    """
+    A version 7 UUID (RFC 9562): the Unix time in milliseconds in the first
+    48 bits, random bits after. Ids made one after another sort together,
+    so inserts land at the right edge of the primary key index instead of
+    on a random page of it.
+    """
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), 'big')
+    # Version 7 in bits 76-79, RFC 4122 variant (0b10) in bits 62-63
+    value = value & ~(0xF << 76) | 0x7 << 76
+    value = value & ~(0x3 << 62) | 0x2 << 62
+    return uuid.UUID(int=value)
+
+
+def new_copy_id():
+    """
+    Default of BookInstance.id: a time-ordered uuid7(), or a random uuid4()
+    with settings.CATALOG_UUID_VERSION = 4.
+    """
+    if getattr(settings, 'CATALOG_UUID_VERSION', 7) == 4:
+        return uuid.uuid4()
+    return uuid7()
+
+
+class CompactUUIDField(models.UUIDField):
+    """
+    A UUIDField stored in 16 bytes everywhere: the native uuid type where
+    the backend has one (PostgreSQL), a BLOB instead of char(32) elsewhere
+    (SQLite). In Python the value is a uuid.UUID either way.
+
+    Its own internal type keeps the backend's char(32) UUID converter off
+    the BLOB values; from_db_value converts them instead.
+    """
+
+    def get_internal_type(self):
+        return 'CompactUUIDField'
+
+    def db_type(self, connection):
+        if connection.features.has_native_uuid_field:
+            return connection.data_types['UUIDField']
+        return 'blob'
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        value = super().get_db_prep_value(value, connection, prepared)
+        if value is None or connection.features.has_native_uuid_field:
+            return value
+        # The parent has turned it into 32 hex digits
+        return uuid.UUID(hex=value).bytes
+
+    def from_db_value(self, value, expression, connection):
+        if value is None or isinstance(value, uuid.UUID):
+            return value
+        if isinstance(value, bytes):
+            return uuid.UUID(bytes=value)
+        return uuid.UUID(value)
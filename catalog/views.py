@@ -1,40 +1,47 @@
 import datetime
 
 from django.shortcuts import render, get_object_or_404
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, StreamingHttpResponse, Http404
 from django.urls import reverse, reverse_lazy
+from django.utils.http import urlencode
 from django.views import generic
 from django.contrib.auth.mixins import LoginRequiredMixin,  PermissionRequiredMixin
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required, permission_required
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
+from django.utils.translation import gettext as _
 
-from .forms import RenewBookForm
-from .models import Book, Author, BookInstance, Genre
+from .conditional import ObjectVersionMixin, TableVersionMixin
+from .counters import get_counters
+from .export import FORMATS, RESOURCES, export
+from .facets import facet_choices, filter_books, selected_facets
+from .forms import BulkLoanForm, RenewBookForm
+from .loans import on_loan, overdue_loans, renew, renew_many, return_many
+from .models import Book, Author, BookInstance
+from .pagecache import CachedPageMixin
+from .pagination import CursorPaginationMixin
+from .search import SearchResults
+from .visits import visit_key, visits
 
 
 def index(request):
     """
     Функция отображения для домашней страницы сайта.
     """
-    # Генерация "количеств" некоторых главных объектов
-    num_books = Book.objects.all().count()
-    # num_books_with_word = Book.objects.filter(author__exact='').count()
-    num_instances = BookInstance.objects.all().count()
-
-    # Доступные книги (статус = 'а')
-    num_instances_available = BookInstance.objects.filter(status__exact='a').count()
-    num_authors = Author.objects.count()  # Метод all применён по умолчанию
-    num_genres = Genre.objects.filter(name__icontains='science').count()
-
-    num_visits = request.session.get('num_visits', 1)
-    request.session['num_visits'] = num_visits + 1
+    # Все "количества" главных объектов одним запросом, из кэша если он тёплый
+    counters = get_counters()
+
+    # Посещения считаются в памяти процесса и пишутся пачками (catalog.visits):
+    # сессия не меняется, так что анонимам без сессии она и не создаётся.
+    # Счётчик из данных старых сессий берётся как начальное значение.
+    session_key = visit_key(request.session)
+    if session_key:
+        num_visits = visits.hit(session_key, initial=request.session.get('num_visits', 1) - 1)
+    else:
+        num_visits = 1
 
     context = {
-        'num_books': num_books,
-        'num_instances': num_instances,
-        'num_instances_available': num_instances_available,
-        'num_authors': num_authors,
-        'num_genres': num_genres,
+        **counters,
         'num_visits': num_visits,
     }
 
@@ -43,46 +50,130 @@ def index(request):
     return render(request, 'index.html', context=context)
 
 
-class BookListView(generic.ListView):
+class BookListView(TableVersionMixin, CachedPageMixin, CursorPaginationMixin, generic.ListView):
     model = Book
     context_object_name = 'book_list'
     # queryset = Book.objects.filter(title__icontains='мир')
     template_name = 'books/my_template_name_list.html'
     paginate_by = 5
 
+    def get_queryset(self):
+        # Фильтры по языку и жанру (?language=&genre=), см. catalog.facets
+        self.selected_facets = selected_facets(self.request.GET)
+        return filter_books(Book.objects.select_related('author'), self.selected_facets)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['facets'] = facet_choices(self.selected_facets)
+        context['page_query'] = urlencode(self.selected_facets, doseq=True)
+        context['facets_selected'] = any(self.selected_facets.values())
+        return context
+
+    def get_cache_tags(self):
+        return ['books']
+
+
+class BookSearchView(generic.ListView):
+    context_object_name = 'book_list'
+    template_name = 'catalog/book_search.html'
+    paginate_by = 10
+
+    def get_queryset(self):
+        # Ранжированный поиск по полнотекстовому индексу FTS5 (catalog.search)
+        return SearchResults(self.request.GET.get('q', ''))
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.request.GET.get('q', '')
+        if context['query']:
+            context['page_query'] = urlencode({'q': context['query']})
+        return context
 
-class BookDetailView(generic.DetailView):
+
+class BookDetailView(ObjectVersionMixin, CachedPageMixin, generic.DetailView):
     model = Book
+    # Автор и язык через JOIN, жанры и экземпляры - по одному запросу на всю страницу
+    queryset = Book.objects.select_related('author', 'language').prefetch_related('genre', 'bookinstance_set')
+
+    def get_cache_tags(self):
+        return [f'book:{self.kwargs["pk"]}']
 
 
-class AuthorListView(generic.ListView):
+class AuthorListView(TableVersionMixin, CachedPageMixin, CursorPaginationMixin, generic.ListView):
     model = Author
     context_object_name = 'authors'
     template_name = 'authors.html'
     paginate_by = 10
 
+    def get_cache_tags(self):
+        return ['authors']
+
 
-class AuthorDetailView(generic.DetailView):
+class AuthorDetailView(ObjectVersionMixin, CachedPageMixin, generic.DetailView):
     model = Author
 
+    def get_cache_tags(self):
+        return [f'author:{self.kwargs["pk"]}']
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Количество экземпляров хранится в самой книге (Book.copies_*)
+        context['books'] = self.object.book_set.order_by('title')
+        return context
+
+
+# Только те колонки, которые читают шаблоны списков выданных книг
+LOAN_LIST_FIELDS = ('id', 'status', 'due_back', 'book__id', 'book__title', 'borrower__id', 'borrower__username')
 
-class LoanedBookByUserListView(LoginRequiredMixin, generic.ListView):
+
+class LoanedBookByUserListView(LoginRequiredMixin, CursorPaginationMixin, generic.ListView):
     model = BookInstance
     template_name = 'catalog/bookinstance_list_borrowed_user.html'
     paginate_by = 10
 
     def get_queryset(self):
-        return BookInstance.objects.filter(borrower=self.request.user).filter(status__exact='o').order_by('due_back')
+        return (BookInstance.objects.filter(borrower=self.request.user).filter(status__exact='o')
+                .order_by('due_back').select_related('book', 'borrower').only(*LOAN_LIST_FIELDS))
 
 
-class Librarian(LoginRequiredMixin, PermissionRequiredMixin, generic.ListView):
+class Librarian(LoginRequiredMixin, PermissionRequiredMixin, CursorPaginationMixin, generic.ListView):
     model = BookInstance
     permission_required = 'catalog.can_mark_returned'
     template_name = 'catalog/bookinstance_list_all_borrowed.html'
     paginate_by = 10
 
+    def overdue_only(self):
+        return bool(self.request.GET.get('overdue_only'))
+
     def get_queryset(self):
-        return BookInstance.objects.filter(status__exact='o').order_by('due_back')
+        # С ?overdue_only=1 - тот же запрос, что и у manage.py overdue_report
+        loans = overdue_loans() if self.overdue_only() else on_loan()
+        return loans.select_related('book', 'borrower').only(*LOAN_LIST_FIELDS)
+
+    def get_context_data(self, **kwargs):
+        if self.overdue_only():
+            kwargs.update(overdue_only=True, page_query='overdue_only=1')
+        kwargs.setdefault('bulk_form', BulkLoanForm(initial={
+            'renewal_date': datetime.date.today() + datetime.timedelta(weeks=3),
+        }))
+        return super().get_context_data(**kwargs)
+
+    def post(self, request, *args, **kwargs):
+        # Продление или возврат отмеченных экземпляров: дата проверяется
+        # один раз, запись - одним UPDATE ... WHERE id IN (...) на пачку
+        form = BulkLoanForm(request.POST)
+        if not form.is_valid():
+            self.object_list = self.get_queryset()
+            return self.render_to_response(self.get_context_data(bulk_form=form))
+
+        copies = form.cleaned_data['copies']
+        if form.cleaned_data['action'] == 'renew':
+            renewed = renew_many(copies, form.cleaned_data['renewal_date'])
+            messages.success(request, _('Renewed %(count)d copies.') % {'count': renewed})
+        else:
+            returned = return_many(copies)
+            messages.success(request, _('Marked %(count)d copies as returned.') % {'count': returned})
+        return HttpResponseRedirect(request.get_full_path())
 
 
 @login_required
@@ -94,14 +185,23 @@ def renew_book_librarian(request, pk):
         form = RenewBookForm(request.POST)
 
         if form.is_valid():
-            book_instance.due_back = form.cleaned_data['renewal_date']
-            book_instance.save()
-
-            return HttpResponseRedirect(reverse('all-borrowed'))
+            # Обновляется только due_back и только если экземпляр не меняли
+            # после открытия формы (иначе чужие изменения были бы затёрты)
+            if renew(book_instance, form.cleaned_data['renewal_date'], form.cleaned_data['version']):
+                return HttpResponseRedirect(reverse('all-borrowed'))
+
+            # Форма заново, с текущей версией экземпляра
+            book_instance.refresh_from_db()
+            data = request.POST.copy()
+            data['version'] = book_instance.version
+            form = RenewBookForm(data)
+            form.is_valid()
+            form.add_error(None, _('This copy was changed by someone else while you were renewing it. '
+                                   'Check its current state and submit again.'))
 
     else:
         proposed_renewal_date = datetime.date.today() + datetime.timedelta(weeks=3)
-        form = RenewBookForm(initial={'renewal_date': proposed_renewal_date})
+        form = RenewBookForm(initial={'renewal_date': proposed_renewal_date, 'version': book_instance.version})
 
     context = {
         'form': form,
@@ -111,6 +211,19 @@ def renew_book_librarian(request, pk):
     return render(request, 'catalog/book_renew_librarian.html', context)
 
 
+@login_required
+@permission_required('catalog.can_mark_returned', raise_exception=True)
+def export_catalog(request, resource):
+    # Выгрузка потоком, по частям - память не зависит от размера каталога
+    output_format = request.GET.get('format', 'csv')
+    if resource not in RESOURCES or output_format not in FORMATS:
+        raise Http404('Unknown export')
+    extension = 'csv' if output_format == 'csv' else 'jsonl'
+    response = StreamingHttpResponse(export(resource, output_format), content_type=FORMATS[output_format][1])
+    response['Content-Disposition'] = f'attachment; filename="{resource}.{extension}"'
+    return response
+
+
 class AuthorCreate(LoginRequiredMixin, PermissionRequiredMixin, CreateView):
     permission_required = 'catalog.add_author'
     model = Author
@@ -0,0 +1,113 @@
+import datetime
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import SessionVisits
+
+# Adds the hits of a flush to the stored count; the same syntax works on
+# SQLite (3.24+) and PostgreSQL
+UPSERT = (
+    'INSERT INTO {table} (session_key, visits, last_visit) VALUES (%s, %s, %s) '
+    'ON CONFLICT (session_key) DO UPDATE SET visits = {table}.visits + excluded.visits, '
+    'last_visit = excluded.last_visit'
+)
+
+
+class VisitBuffer:
+    """
+    Per-process visit counts by session key. Hits are counted in memory and
+    written in one bulk upsert by the first hit after
+    CATALOG_VISITS_FLUSH_INTERVAL seconds, so a visit costs no write; the
+    first hit of a session after a flush reads its stored count once.
+
+    Counts shown by different workers can lag each other by up to one flush
+    interval, and the hits of an interval are lost if the worker stops.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}   # session key: count shown, stored and pending hits
+        self._pending = {}  # session key: hits not written yet
+        self._generation = 0  # flushes that have dropped _counts
+        self._last_flush = time.monotonic()
+
+    def _stored_count(self, session_key):
+        return SessionVisits.objects.filter(session_key=session_key).values_list('visits', flat=True).first()
+
+    def hit(self, session_key, initial=0):
+        """
+        Counts a visit of the session and returns its visits so far, this
+        one included. initial is the count of a session not stored yet.
+        """
+        generation = stored = None
+        while True:
+            with self._lock:
+                # A count read while a flush dropped _counts may miss the hits it wrote: read it again
+                if session_key in self._counts or generation == self._generation:
+                    if session_key not in self._counts:
+                        # Hits since the last flush began are not stored yet
+                        pending = self._pending.get(session_key)
+                        self._counts[session_key] = (stored or 0) + (pending or 0)
+                        if stored is None and pending is None:
+                            # A session without a stored count starts from initial
+                            self._pending[session_key] = initial
+                            self._counts[session_key] += initial
+                    self._counts[session_key] += 1
+                    self._pending[session_key] = self._pending.get(session_key, 0) + 1
+                    count = self._counts[session_key]
+                    due = time.monotonic() - self._last_flush >= settings.CATALOG_VISITS_FLUSH_INTERVAL
+                    break
+                generation = self._generation
+            stored = self._stored_count(session_key)
+        if due:
+            self.flush()
+        return count
+
+    def flush(self):
+        """
+        Writes the pending hits and drops the rows of sessions that have
+        expired since their last visit. Returns the number of sessions written.
+
+        The counts in memory are dropped once the hits are written, so a
+        session counted again reads a stored count that has them.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+        now = timezone.now()
+        last_visit = connection.ops.adapt_datetimefield_value(now)
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(
+                    UPSERT.format(table=connection.ops.quote_name(SessionVisits._meta.db_table)),
+                    [(session_key, hits, last_visit) for session_key, hits in pending.items()],
+                )
+                expired = now - datetime.timedelta(seconds=settings.SESSION_COOKIE_AGE)
+                SessionVisits.objects.filter(last_visit__lt=expired).delete()
+        finally:
+            with self._lock:
+                self._counts = {}
+                self._generation += 1
+        return len(pending)
+
+
+def visit_key(session):
+    """
+    Key of the session's visit count, or None for a visitor without a
+    session. Signed cookie sessions have the whole cookie as their key, so
+    it is hashed to fit SessionVisits.session_key.
+    """
+    session_key = session.session_key
+    if session_key and len(session_key) > SessionVisits._meta.get_field('session_key').max_length:
+        return hashlib.md5(session_key.encode()).hexdigest()
+    return session_key
+
+
+visits = VisitBuffer()
\ No newline at end of file